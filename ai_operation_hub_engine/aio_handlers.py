@@ -0,0 +1,184 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from graphene import ResolveInfo
+
+from .handlers import (
+    read_coordination_thread,
+    coordination_thread_listeners,
+    coordination_thread_wait,
+    coordination_threads,
+    execute_graphql_queries,
+    execute_graphql_query,
+    get_ask_openai,
+    get_connection_by_email,
+    get_coordination,
+    get_coordination_thread,
+    get_current_run,
+    get_last_message,
+    insert_update_coordination_session,
+    insert_update_coordination_thread,
+    resolve_ask_operation_agent_handler,
+    resolve_ask_operation_agents_handler,
+)
+from .models import Thread
+from .run_poller import run_poll_intervals
+from .types import CoordinationThreadType
+
+# Downstream hops are blocking boto3 Lambda invokes; they run on this pool so
+# the event loop keeps serving other requests while they are in flight.
+aio_executor = None
+aio_executor_lock = threading.Lock()
+aio_max_workers = 32
+
+
+def aio_handlers_init(setting: Dict[str, Any]) -> None:
+    global aio_max_workers
+    aio_max_workers = int(setting.get("aio_max_workers", 32))
+
+
+def get_aio_executor() -> ThreadPoolExecutor:
+    global aio_executor
+    if aio_executor is None:
+        with aio_executor_lock:
+            if aio_executor is None:
+                aio_executor = ThreadPoolExecutor(
+                    max_workers=aio_max_workers,
+                    thread_name_prefix="ai-operation-hub-aio",
+                )
+    return aio_executor
+
+
+async def run_blocking(fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    """Await a blocking call without blocking the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(
+        get_aio_executor(),
+        functools.partial(contextvars.copy_context().run, fn, *args, **kwargs),
+    )
+
+
+def awaitable(fn: Callable) -> Callable:
+    """Wrap a blocking handler into a coroutine function with the same signature."""
+
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return await run_blocking(fn, *args, **kwargs)
+
+    return wrapper
+
+
+execute_graphql_query_async = awaitable(execute_graphql_query)
+execute_graphql_queries_async = awaitable(execute_graphql_queries)
+get_coordination_async = awaitable(get_coordination)
+get_coordination_thread_async = awaitable(get_coordination_thread)
+get_ask_openai_async = awaitable(get_ask_openai)
+get_current_run_async = awaitable(get_current_run)
+get_last_message_async = awaitable(get_last_message)
+get_connection_by_email_async = awaitable(get_connection_by_email)
+insert_update_coordination_session_async = awaitable(insert_update_coordination_session)
+insert_update_coordination_thread_async = awaitable(insert_update_coordination_thread)
+resolve_ask_operation_agent_handler_async = awaitable(
+    resolve_ask_operation_agent_handler
+)
+resolve_ask_operation_agents_handler_async = awaitable(
+    resolve_ask_operation_agents_handler
+)
+
+
+async def wait_for_coordination_thread_async(
+    info: ResolveInfo,
+    coordination_thread: Thread,
+    wait_seconds: float,
+    until_status: List[str] = None,
+) -> Thread:
+    """wait_for_coordination_thread for the event loop: the wait holds no pool
+    thread, only the reads do.
+
+    Writes made by this engine, in any thread, set an asyncio.Event; other
+    changes are picked up by reads backed off like the run polls.
+    """
+    deadline, done = coordination_thread_wait(
+        info, coordination_thread, wait_seconds, until_status=until_status
+    )
+    session_uuid = coordination_thread.session_uuid
+    thread_id = coordination_thread.thread_id
+
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+
+    def listener() -> None:
+        try:
+            loop.call_soon_threadsafe(changed.set)
+        except RuntimeError:
+            pass  # The loop has closed.
+
+    coordination_thread_listeners.add(listener)
+    try:
+        intervals = run_poll_intervals(info.context.get("setting"))
+        next_read_at = time.time() + next(intervals)
+        while not done(coordination_thread):
+            now = time.time()
+            if now >= deadline:
+                break
+            try:
+                await asyncio.wait_for(
+                    changed.wait(), min(next_read_at, deadline) - now
+                )
+            except asyncio.TimeoutError:
+                pass
+            changed.clear()
+
+            coordination_thread = coordination_threads.get(
+                (info.context.get("endpoint_id"), session_uuid, thread_id),
+                coordination_thread,
+            )
+            if done(coordination_thread) or time.time() < next_read_at:
+                continue
+            coordination_thread = await run_blocking(
+                read_coordination_thread, info, session_uuid, thread_id
+            )
+            next_read_at = time.time() + next(intervals)
+        return coordination_thread
+    finally:
+        coordination_thread_listeners.discard(listener)
+
+
+async def resolve_coordination_thread_handler_async(
+    info: ResolveInfo, **kwargs: Dict[str, Any]
+) -> CoordinationThreadType:
+    """resolve_coordination_thread_handler for the event loop."""
+    try:
+        # A long poll starts from the stored thread, so an answer cached
+        # before a newer ask cannot end it at once.
+        coordination_thread = await run_blocking(
+            read_coordination_thread,
+            info,
+            kwargs["session_uuid"],
+            kwargs["thread_id"],
+            cached=not kwargs.get("wait_seconds"),
+        )
+        if kwargs.get("wait_seconds"):
+            coordination_thread = await wait_for_coordination_thread_async(
+                info,
+                coordination_thread,
+                kwargs["wait_seconds"],
+                until_status=kwargs.get("until_status"),
+            )
+
+        return coordination_thread.to_coordination_thread_type()
+    except Exception as e:
+        log = traceback.format_exc()
+        info.context.get("logger").error(log)
+        raise e
@@ -0,0 +1,93 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+
+class TTLCache(object):
+    """A thread-safe, bounded LRU cache whose entries expire after a TTL."""
+
+    def __init__(self, ttl: float = 300, maxsize: int = 256) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.RLock()
+
+    def configure(self, ttl: float = None, maxsize: int = None) -> None:
+        with self.lock:
+            if ttl is not None:
+                self.ttl = float(ttl)
+            if maxsize is not None:
+                self.maxsize = int(maxsize)
+            self._evict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self.entries[key]
+                return default
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value; ``ttl`` overrides the cache TTL for this entry."""
+        with self.lock:
+            self.entries[key] = (
+                value,
+                time.time() + (self.ttl if ttl is None else ttl),
+            )
+            self.entries.move_to_end(key)
+            self._evict()
+
+    def add(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        """Store a value only if the key holds none; return whether it was stored."""
+        with self.lock:
+            if key in self:
+                return False
+            self.set(key, value, ttl=ttl)
+            return True
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Return the (key, value) pairs that have not expired."""
+        now = time.time()
+        with self.lock:
+            return [
+                (key, value)
+                for key, (value, expires_at) in self.entries.items()
+                if expires_at > now
+            ]
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def invalidate(self, predicate: Callable[[Hashable], bool] = None) -> None:
+        """Drop every entry, or only the entries whose key matches the predicate."""
+        with self.lock:
+            if predicate is None:
+                self.entries.clear()
+                return
+            for key in [key for key in self.entries if predicate(key)]:
+                del self.entries[key]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.entries)
+
+    def _evict(self) -> None:
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
@@ -0,0 +1,135 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import hashlib
+from inspect import isawaitable
+from typing import Any, Dict, List, Optional, Tuple
+
+from graphene import Schema
+from graphene.types.schema import normalize_execute_kwargs
+from graphql import (
+    DocumentNode,
+    ExecutionResult,
+    GraphQLError,
+    GraphQLSchema,
+    execute,
+    parse,
+    validate,
+)
+
+from .cache import TTLCache
+from .stores import InMemoryStore, load_store
+
+# Parsed and validated documents, keyed by the SHA-256 of the document text.
+documents = TTLCache(ttl=float("inf"), maxsize=128)
+# Persisted query texts by SHA-256, fronting the optional shared backend.
+persisted_queries = InMemoryStore(maxsize=1024)
+persisted_query_backend = None
+
+
+def document_hash(source: str) -> str:
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def get_document(
+    graphql_schema: GraphQLSchema, source: str
+) -> Tuple[Optional[DocumentNode], List[GraphQLError]]:
+    """Return the parsed document and its validation errors, parsing each text once."""
+    key = document_hash(source)
+    entry = documents.get(key)
+    if entry is None:
+        try:
+            document = parse(source)
+        except GraphQLError as error:
+            return None, [error]
+        entry = (document, validate(graphql_schema, document))
+        documents.set(key, entry)
+    return entry
+
+
+class PersistedQueryError(str):
+    """Stands in for the document of a persisted query that cannot be served."""
+
+    def __new__(cls, message: str, code: str) -> "PersistedQueryError":
+        error = str.__new__(cls, message)
+        error.code = code
+        return error
+
+
+def persisted_queries_init(setting: Dict[str, Any]) -> None:
+    global persisted_query_backend
+    if persisted_query_backend is None and setting.get("persisted_query_store"):
+        persisted_query_backend = load_store(setting["persisted_query_store"])
+
+
+def resolve_persisted_query(params: Dict[str, Any]) -> Optional[str]:
+    """Return the document of a request, following automatic persisted queries.
+
+    A request carrying ``extensions.persistedQuery.sha256Hash`` (or
+    ``query_hash``) without a query is served from the store; with a query,
+    the query is registered under its hash for the next calls.
+    """
+    persisted_query = (params.get("extensions") or {}).get("persistedQuery") or {}
+    sha256_hash = persisted_query.get("sha256Hash") or params.get("query_hash")
+    query = params.get("query")
+    if sha256_hash is None:
+        return query
+
+    if query:
+        if document_hash(query) != sha256_hash:
+            return PersistedQueryError(
+                "provided sha does not match query", "INVALID_PERSISTED_QUERY"
+            )
+        persisted_queries.set(sha256_hash, query)
+        if persisted_query_backend is not None:
+            persisted_query_backend.set(sha256_hash, query)
+        return query
+
+    query = persisted_queries.get(sha256_hash)
+    if query is None and persisted_query_backend is not None:
+        query = persisted_query_backend.get(sha256_hash)
+        if query is not None:
+            persisted_queries.set(sha256_hash, query)
+    if query is None:
+        return PersistedQueryError(
+            "PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND"
+        )
+    return query
+
+
+class CachedSchema(Schema):
+    """A graphene schema that parses and validates every document only once."""
+
+    def _execute(self, *args: Any, **kwargs: Any) -> Any:
+        kwargs = normalize_execute_kwargs(kwargs)
+        kwargs.pop("check_sync", None)
+        if args:
+            source, args = args[0], args[1:]
+        else:
+            source = kwargs.pop("source")
+
+        if isinstance(source, PersistedQueryError):
+            return ExecutionResult(
+                data=None,
+                errors=[GraphQLError(str(source), extensions={"code": source.code})],
+            )
+
+        document, errors = get_document(self.graphql_schema, source)
+        if errors:
+            return ExecutionResult(data=None, errors=errors)
+        return execute(self.graphql_schema, document, *args, **kwargs)
+
+    def execute(self, *args: Any, **kwargs: Any) -> ExecutionResult:
+        result = self._execute(*args, **kwargs)
+        if isawaitable(result):
+            raise RuntimeError("GraphQL execution failed to complete synchronously.")
+        return result
+
+    async def execute_async(self, *args: Any, **kwargs: Any) -> ExecutionResult:
+        result = self._execute(*args, **kwargs)
+        if isawaitable(result):
+            return await result
+        return result
@@ -4,27 +4,115 @@ from __future__ import print_function
 
 __author__ = "bibow"
 
+import contextvars
+import hashlib
+import json
 import logging
+import os
+import tempfile
+import threading
 import time
 import traceback
-from typing import Any, Dict, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import boto3
-import humps
 from boto3.dynamodb.conditions import Attr, Key
 from graphene import ResolveInfo
 
 from silvaengine_utility import Utility
 
-from .types import AskOperationAgentType, CoordinationThreadType
+from .cache import TTLCache
+from .models import Agent, Coordination, Run, Session, Thread
+from .operations import (
+    generate_projected_operation,
+    merge_operations,
+    merge_variables,
+    operation_arguments,
+    split_results,
+)
+from .run_poller import RUN_FAILED_STATUSES, RunPoller, run_poll_intervals
+from .single_flight import SingleFlight, single_flight_key
+from .stores import DynamoDBStore, load_store
+from .tracing import measure_payloads, payload_bytes, record_run, span
+from .types import (
+    AskOperationAgentResultType,
+    AskOperationAgentType,
+    CoordinationThreadType,
+)
+from .views import materialize, snake_case_view
+from .write_buffer import ThreadWriteBuffer
 
 functs_on_local = None
 funct_on_local_config = None
-aws_lambda = None
-aws_dynamodb = None
-aws_ses = None
+# AWS clients are created on first use and kept across warm invocations.
+aws_clients = {}
+aws_client_kwargs = None
+aws_clients_lock = threading.Lock()
 source_email = None
-schemas = {}
+schemas = TTLCache(ttl=3600, maxsize=64)
+schema_cache_dir = None
+# Generated operation documents, keyed by (function_name, operation_name,
+# operation_type, fields, schema fingerprint); batched documents by
+# (function_name, signature, "Batch", schema fingerprint).
+operations = TTLCache(ttl=float("inf"), maxsize=512)
+
+# Downstream errors raised when a generated operation no longer matches the
+# schema. Errors a caller can cause, such as a missing required variable, are
+# left out so they do not trigger a refetch.
+STALE_SCHEMA_ERRORS = (
+    "Cannot query field",
+    "Unknown argument",
+    "Unknown type",
+)
+
+# Coordination definitions, keyed by (endpoint_id, coordination_uuid).
+coordinations = TTLCache(ttl=300, maxsize=256)
+
+# askOpenAi variables of an agent, keyed by (endpoint_id, coordination_uuid,
+# agent_name). A request only reads the whole agent when its template is
+# missing, so an edited agent is picked up once the entry expires or
+# invalidate_coordination drops it.
+agent_templates = TTLCache(ttl=300, maxsize=256)
+
+# Threads served by the coordination_thread query, keyed by
+# (endpoint_id, session_uuid, thread_id). Threads in a settled status are
+# kept for the cache TTL, threads still in flight only briefly. A settled
+# thread is reused by the next ask, possibly in another container, so the
+# TTL stays short.
+TERMINAL_THREAD_STATUSES = ("completed", "fail", "unassigned")
+coordination_threads = TTLCache(ttl=5, maxsize=1024)
+coordination_thread_in_flight_ttl = 2
+# Notified whenever this engine writes a thread, to wake long-polling reads.
+coordination_thread_changed = threading.Condition()
+# Callbacks run on every thread write, for waits that cannot block on the
+# condition, such as the long polls of the asyncio entry point.
+coordination_thread_listeners = set()
+
+# Recent receiver email lookups, keyed by (endpoint_id, email).
+connections = TTLCache(ttl=30, maxsize=1024)
+wss_connections_email_index = None
+wss_connections_email_attribute = None
+
+# Shared pool for independent downstream hops of a request.
+executor = None
+executor_lock = threading.Lock()
+fan_out_max_workers = 8
+
+# Identical ask_operation_agent calls share one run; see SingleFlight.
+ask_operation_agent_flights = SingleFlight()
+ask_operation_agent_flights_config = None
+
+# Context of dispatched runs waiting for a completion event, keyed by run_id.
+# The event usually reaches another container, so the store is shared; its
+# entries expire after run_poll_deadline.
+pending_runs = None
+pending_runs_config = None
+# Key of the lease in the pending runs store held by the poll_pending_runs
+# invocation sweeping it, so one invocation at a time polls the runs.
+RUN_POLLER_LEASE = "run-poller"
+run_poller = None
+run_poller_lock = threading.Lock()
 
 ## Test the waters 🧪 before diving in!
 ##<--Testing Data-->##
@@ -35,12 +123,16 @@ test_mode = None
 
 
 def handlers_init(logger: logging.Logger, **setting: Dict[str, Any]) -> None:
-    global functs_on_local, aws_lambda, aws_dynamodb, aws_ses, source_email
+    global functs_on_local, source_email
     global endpoint_id, connection_id, test_mode
     try:
         _initialize_functs_on_local(setting)
         _initialize_aws_clients(setting)
         _initialize_source_email(setting)
+        _initialize_caches(setting)
+        _initialize_fan_out(setting)
+        _initialize_single_flight(setting)
+        _initialize_pending_runs(setting)
         _initialize_test_data(setting)
     except Exception as e:
         log = traceback.format_exc()
@@ -54,34 +146,51 @@ def _initialize_functs_on_local(setting: Dict[str, Any]) -> None:
 
 
 def _initialize_aws_clients(setting: Dict[str, Any]) -> None:
-    global aws_lambda, aws_dynamodb, aws_ses
+    global aws_client_kwargs
     if (
         setting.get("region_name")
         and setting.get("aws_access_key_id")
         and setting.get("aws_secret_access_key")
     ):
-        aws_lambda = boto3.client(
-            "lambda",
-            region_name=setting.get("region_name"),
-            aws_access_key_id=setting.get("aws_access_key_id"),
-            aws_secret_access_key=setting.get("aws_secret_access_key"),
-        )
-        aws_dynamodb = boto3.resource(
-            "dynamodb",
-            region_name=setting.get("region_name"),
-            aws_access_key_id=setting.get("aws_access_key_id"),
-            aws_secret_access_key=setting.get("aws_secret_access_key"),
-        )
-        aws_ses = boto3.client(
-            "ses",
-            region_name=setting.get("region_name"),
-            aws_access_key_id=setting.get("aws_access_key_id"),
-            aws_secret_access_key=setting.get("aws_secret_access_key"),
-        )
+        client_kwargs = {
+            "region_name": setting.get("region_name"),
+            "aws_access_key_id": setting.get("aws_access_key_id"),
+            "aws_secret_access_key": setting.get("aws_secret_access_key"),
+        }
     else:
-        aws_lambda = boto3.client("lambda")
-        aws_dynamodb = boto3.resource("dynamodb")
-        aws_ses = boto3.client("ses")
+        client_kwargs = {}
+
+    with aws_clients_lock:
+        # Keep the clients of a warm container unless the credentials changed.
+        if client_kwargs != aws_client_kwargs:
+            aws_client_kwargs = client_kwargs
+            aws_clients.clear()
+
+
+def _get_aws_client(service_name: str) -> Any:
+    client = aws_clients.get(service_name)
+    if client is None:
+        with aws_clients_lock:
+            client = aws_clients.get(service_name)
+            if client is None:
+                if service_name == "dynamodb":
+                    client = boto3.resource(service_name, **(aws_client_kwargs or {}))
+                else:
+                    client = boto3.client(service_name, **(aws_client_kwargs or {}))
+                aws_clients[service_name] = client
+    return client
+
+
+def get_aws_lambda() -> Any:
+    return _get_aws_client("lambda")
+
+
+def get_aws_dynamodb() -> Any:
+    return _get_aws_client("dynamodb")
+
+
+def get_aws_ses() -> Any:
+    return _get_aws_client("ses")
 
 
 def _initialize_source_email(setting: Dict[str, Any]) -> None:
@@ -89,6 +198,92 @@ def _initialize_source_email(setting: Dict[str, Any]) -> None:
     source_email = setting.get("source_email")
 
 
+def _initialize_caches(setting: Dict[str, Any]) -> None:
+    global schema_cache_dir, wss_connections_email_index, wss_connections_email_attribute
+    global coordination_thread_in_flight_ttl
+    schemas.configure(ttl=setting.get("graphql_schema_cache_ttl", 3600))
+    connections.configure(ttl=setting.get("connection_cache_ttl", 30))
+    coordinations.configure(
+        ttl=setting.get("coordination_cache_ttl", 300),
+        maxsize=setting.get("coordination_cache_size", 256),
+    )
+    agent_templates.configure(
+        ttl=setting.get("coordination_cache_ttl", 300),
+        maxsize=setting.get("coordination_cache_size", 256),
+    )
+    coordination_threads.configure(
+        ttl=setting.get("coordination_thread_cache_ttl", 5),
+        maxsize=setting.get("coordination_thread_cache_size", 1024),
+    )
+    coordination_thread_in_flight_ttl = float(
+        setting.get("coordination_thread_in_flight_ttl", 2)
+    )
+    # Optional GSI on se-wss-connections whose partition key is the email.
+    wss_connections_email_index = setting.get("wss_connections_email_index")
+    wss_connections_email_attribute = setting.get(
+        "wss_connections_email_attribute", "email"
+    )
+    schema_cache_dir = setting.get(
+        "graphql_schema_cache_dir",
+        os.path.join(tempfile.gettempdir(), "ai_operation_hub_engine", "schemas"),
+    )
+
+
+def _initialize_fan_out(setting: Dict[str, Any]) -> None:
+    global fan_out_max_workers
+    fan_out_max_workers = int(setting.get("fan_out_max_workers", 8))
+
+
+def _initialize_single_flight(setting: Dict[str, Any]) -> None:
+    global ask_operation_agent_flights_config
+    replay_window = float(setting.get("ask_operation_agent_replay_window", 30))
+    store = setting.get("ask_operation_agent_replay_store")
+    # Duplicates on Lambda land in other containers, so without a store
+    # setting calls are claimed in a DynamoDB table with partition key "key"
+    # and TTL enabled on "expires_at".
+    table_name = None
+    if not store and os.environ.get("AWS_LAMBDA_FUNCTION_NAME") is not None:
+        table_name = setting.get(
+            "ask_operation_agent_flights_table", "ai-operation-hub-flights"
+        )
+    # Rebuild the store only when its setting changes, so replays survive
+    # the engine being constructed again in a warm container.
+    config = (store, table_name, aws_client_kwargs)
+    if config != ask_operation_agent_flights_config:
+        ask_operation_agent_flights_config = config
+        ask_operation_agent_flights.configure(
+            store=(
+                DynamoDBStore(
+                    table_name, ttl=replay_window, **(aws_client_kwargs or {})
+                )
+                if table_name
+                else load_store(store, ttl=replay_window)
+            )
+        )
+    ask_operation_agent_flights.configure(
+        replay_window=replay_window,
+        in_flight_ttl=float(setting.get("ask_operation_agent_in_flight_ttl", 60)),
+        share_window=float(setting.get("ask_operation_agent_share_window", 5)),
+    )
+
+
+def _initialize_pending_runs(setting: Dict[str, Any]) -> None:
+    global pending_runs, pending_runs_config
+    ttl = float(setting.get("run_poll_deadline", 300))
+    store = setting.get("pending_runs_store")
+    # Without a store setting, a DynamoDB table with partition key "key" and
+    # TTL enabled on "expires_at".
+    table_name = setting.get("pending_runs_table", "ai-operation-hub-pending-runs")
+    config = (store, table_name, aws_client_kwargs, ttl)
+    if config == pending_runs_config:
+        return
+    pending_runs_config = config
+    if store:
+        pending_runs = load_store(store, ttl=ttl)
+    else:
+        pending_runs = DynamoDBStore(table_name, ttl=ttl, **(aws_client_kwargs or {}))
+
+
 def _initialize_test_data(setting: Dict[str, Any]) -> None:
     global endpoint_id, connection_id, test_mode
 
@@ -100,24 +295,253 @@ def _initialize_test_data(setting: Dict[str, Any]) -> None:
     ##<--Testing Data-->##
 
 
+def submit(fn: Any, *args: Any, **kwargs: Any) -> Future:
+    """Run an independent downstream hop on the shared fan-out pool."""
+    global executor
+    if executor is None:
+        with executor_lock:
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=fan_out_max_workers,
+                    thread_name_prefix="ai-operation-hub",
+                )
+    # Carry the request context (e.g. its trace) over to the pool thread.
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def _graphql_schema_key(
+    endpoint_id: str, function_name: str, setting: Dict[str, Any] = None
+) -> tuple:
+    schema_version = (
+        (setting or {}).get("graphql_schema_versions", {}).get(function_name, "latest")
+    )
+    return (endpoint_id, function_name, schema_version)
+
+
+def _graphql_schema_path(key: tuple) -> str:
+    digest = hashlib.sha1("|".join(map(str, key)).encode("utf-8")).hexdigest()
+    return os.path.join(schema_cache_dir, f"{key[1]}-{digest[:16]}.json")
+
+
+def _graphql_schema_entry(schema: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+    fingerprint = hashlib.sha1(
+        json.dumps(schema, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return schema, fingerprint
+
+
+def _load_graphql_schema(
+    logger: logging.Logger, key: tuple
+) -> Optional[Tuple[Dict[str, Any], str]]:
+    """Warm-start a schema from the local disk copy if it is still fresh."""
+    if schema_cache_dir is None:
+        return None
+    path = _graphql_schema_path(key)
+    try:
+        age = time.time() - os.path.getmtime(path)
+        if age >= schemas.ttl:
+            return None
+        with open(path, "r") as f:
+            entry = _graphql_schema_entry(json.load(f))
+        schemas.set(key, entry, ttl=schemas.ttl - age)
+        return entry
+    except (OSError, ValueError):
+        return None
+
+
+def _save_graphql_schema(
+    logger: logging.Logger, key: tuple, schema: Dict[str, Any]
+) -> None:
+    if schema_cache_dir is None:
+        return
+    path = _graphql_schema_path(key)
+    try:
+        os.makedirs(schema_cache_dir, exist_ok=True)
+        # Write then rename so a concurrent reader never sees a partial file.
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(schema, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        logger.warning(f"Unable to persist the GraphQL schema to {path}.")
+
+
+def _fetch_graphql_schema_entry(
+    logger: logging.Logger,
+    endpoint_id: str,
+    function_name: str,
+    setting: Dict[str, Any] = None,
+) -> Tuple[Dict[str, Any], str]:
+    key = _graphql_schema_key(endpoint_id, function_name, setting=setting)
+    entry = schemas.get(key)
+    if entry is None:
+        entry = _load_graphql_schema(logger, key)
+    if entry is None:
+        entry = _graphql_schema_entry(
+            Utility.fetch_graphql_schema(
+                logger,
+                endpoint_id,
+                function_name,
+                setting=setting,
+                aws_lambda=get_aws_lambda(),
+                test_mode=test_mode,
+            )
+        )
+        schemas.set(key, entry)
+        _save_graphql_schema(logger, key, entry[0])
+    return entry
+
+
 def fetch_graphql_schema(
     logger: logging.Logger,
     endpoint_id: str,
     function_name: str,
     setting: Dict[str, Any] = None,
 ) -> Dict[str, Any]:
-    global schemas
+    return _fetch_graphql_schema_entry(
+        logger, endpoint_id, function_name, setting=setting
+    )[0]
 
-    if schemas.get(function_name) is None:
-        schemas[function_name] = Utility.fetch_graphql_schema(
-            logger,
-            endpoint_id,
-            function_name,
-            setting=setting,
-            aws_lambda=aws_lambda,
-            test_mode=test_mode,
+
+def invalidate_graphql_schema(
+    endpoint_id: str, function_name: str, setting: Dict[str, Any] = None
+) -> None:
+    """Drop the cached schema of a function and its generated operations."""
+    key = _graphql_schema_key(endpoint_id, function_name, setting=setting)
+    schemas.pop(key)
+    operations.invalidate(lambda operation_key: operation_key[0] == function_name)
+    if schema_cache_dir is not None:
+        try:
+            os.remove(_graphql_schema_path(key))
+        except OSError:
+            pass
+
+
+def get_graphql_operation(
+    logger: logging.Logger,
+    endpoint_id: str,
+    function_name: str,
+    operation_name: str,
+    operation_type: str,
+    setting: Dict[str, Any] = None,
+    fields: Tuple[str, ...] = None,
+) -> str:
+    """Return the operation document, generating it once per schema.
+
+    With ``fields`` only those paths of the result are selected; otherwise
+    the whole object graph is.
+    """
+    schema, fingerprint = _fetch_graphql_schema_entry(
+        logger, endpoint_id, function_name, setting=setting
+    )
+    key = (function_name, operation_name, operation_type, fields, fingerprint)
+    operation = operations.get(key)
+    if operation is None:
+        if fields:
+            try:
+                operation = generate_projected_operation(
+                    operation_name, operation_type, schema, fields
+                )
+            except Exception:
+                logger.warning(
+                    f"Unable to project {operation_name} of {function_name}; selecting every field."
+                )
+        if operation is None:
+            operation = Utility.generate_graphql_operation(
+                operation_name, operation_type, schema
+            )
+        operations.set(key, operation)
+    return operation
+
+
+def get_graphql_operation_arguments(
+    logger: logging.Logger,
+    endpoint_id: str,
+    function_name: str,
+    operation_name: str,
+    operation_type: str,
+    setting: Dict[str, Any] = None,
+) -> List[str]:
+    """Return the arguments an operation accepts; undeclared variables are dropped."""
+    return operation_arguments(
+        operation_name,
+        operation_type,
+        fetch_graphql_schema(logger, endpoint_id, function_name, setting=setting),
+    )
+
+
+def get_batched_graphql_operation(
+    logger: logging.Logger,
+    endpoint_id: str,
+    function_name: str,
+    signature: Tuple[Tuple[str, str, Optional[Tuple[str, ...]]], ...],
+    setting: Dict[str, Any] = None,
+) -> str:
+    """Return the aliased document of a batch, merging it once per schema."""
+    _, fingerprint = _fetch_graphql_schema_entry(
+        logger, endpoint_id, function_name, setting=setting
+    )
+    key = (function_name, signature, "Batch", fingerprint)
+    operation = operations.get(key)
+    if operation is None:
+        operation = merge_operations(
+            [
+                get_graphql_operation(
+                    logger,
+                    endpoint_id,
+                    function_name,
+                    operation_name,
+                    operation_type,
+                    setting=setting,
+                    fields=fields,
+                )
+                for operation_name, operation_type, fields in signature
+            ]
         )
-    return schemas[function_name]
+        operations.set(key, operation)
+    return operation
+
+
+def _execute_graphql_document(
+    logger: logging.Logger,
+    endpoint_id: str,
+    function_name: str,
+    operation_name: str,
+    build_operation: Callable[[], str],
+    variables: Dict[str, Any],
+    setting: Dict[str, Any] = None,
+    connection_id: str = None,
+) -> Dict[str, Any]:
+    for attempt in range(2):
+        operation = build_operation()
+        try:
+            with span(
+                logger,
+                "graphql",
+                function_name=function_name,
+                operation_name=operation_name,
+                payload=variables,
+            ) as record:
+                result = Utility.execute_graphql_query(
+                    logger,
+                    endpoint_id,
+                    function_name,
+                    operation,
+                    variables,
+                    setting=setting,
+                    aws_lambda=get_aws_lambda(),
+                    connection_id=connection_id,
+                    test_mode=test_mode,
+                )
+                if measure_payloads(logger):
+                    record["response_bytes"] = payload_bytes(result)
+            return result
+        except Exception as e:
+            if attempt > 0 or not any(error in str(e) for error in STALE_SCHEMA_ERRORS):
+                raise e
+            # The cached schema is stale; introspect again and retry once.
+            logger.warning(f"Stale GraphQL schema for {function_name}, refetching: {e}")
+            invalidate_graphql_schema(endpoint_id, function_name, setting=setting)
 
 
 def execute_graphql_query(
@@ -129,20 +553,71 @@ def execute_graphql_query(
     variables: Dict[str, Any],
     setting: Dict[str, Any] = {},
     connection_id: str = None,
+    fields: Tuple[str, ...] = None,
 ) -> Dict[str, Any]:
-    schema = fetch_graphql_schema(logger, endpoint_id, function_name, setting=setting)
-    result = Utility.execute_graphql_query(
+    return _execute_graphql_document(
         logger,
         endpoint_id,
         function_name,
-        Utility.generate_graphql_operation(operation_name, operation_type, schema),
+        operation_name,
+        lambda: get_graphql_operation(
+            logger,
+            endpoint_id,
+            function_name,
+            operation_name,
+            operation_type,
+            setting=setting,
+            fields=fields,
+        ),
         variables,
         setting=setting,
-        aws_lambda=aws_lambda,
         connection_id=connection_id,
-        test_mode=test_mode,
     )
-    return result
+
+
+def execute_graphql_queries(
+    logger: logging.Logger,
+    endpoint_id: str,
+    function_name: str,
+    queries: List[Tuple[str, str, Dict[str, Any], Optional[Tuple[str, ...]]]],
+    setting: Dict[str, Any] = {},
+    connection_id: str = None,
+) -> List[Dict[str, Any]]:
+    """Send (operation_name, operation_type, variables, fields) operations of one
+    type to a function as a single aliased document; return each result in order."""
+    if len(queries) == 1:
+        operation_name, operation_type, variables, fields = queries[0]
+        return [
+            execute_graphql_query(
+                logger,
+                endpoint_id,
+                function_name,
+                operation_name,
+                operation_type,
+                variables,
+                setting=setting,
+                connection_id=connection_id,
+                fields=fields,
+            )
+        ]
+
+    signature = tuple(
+        (operation_name, operation_type, fields)
+        for operation_name, operation_type, _, fields in queries
+    )
+    result = _execute_graphql_document(
+        logger,
+        endpoint_id,
+        function_name,
+        ",".join(operation_name for operation_name, _, _ in signature),
+        lambda: get_batched_graphql_operation(
+            logger, endpoint_id, function_name, signature, setting=setting
+        ),
+        merge_variables([variables for _, _, variables, _ in queries]),
+        setting=setting,
+        connection_id=connection_id,
+    )
+    return split_results(result, [operation_name for operation_name, _, _ in signature])
 
 
 def get_coordination(
@@ -150,8 +625,12 @@ def get_coordination(
     endpoint_id: str,
     setting: Dict[str, Any] = None,
     **variables: Dict[str, Any],
-) -> Dict[str, Any]:
-    """Retrieve coordination details."""
+) -> Coordination:
+    """Retrieve coordination details, reading through the coordination cache."""
+    coordination = coordinations.get((endpoint_id, variables["coordinationUuid"]))
+    if coordination is not None:
+        return coordination
+
     coordination = execute_graphql_query(
         logger,
         endpoint_id,
@@ -161,16 +640,75 @@ def get_coordination(
         variables,
         setting=setting,
     )["coordination"]
-    return humps.decamelize(coordination)
+    return cache_coordination(
+        endpoint_id, Coordination.from_response(snake_case_view(coordination))
+    )
+
+
+def cache_coordination(
+    endpoint_id: str, coordination: Optional[Coordination]
+) -> Optional[Coordination]:
+    """Keep a coordination definition read from any downstream response."""
+    if coordination is not None:
+        coordinations.set((endpoint_id, coordination.coordination_uuid), coordination)
+    return coordination
+
+
+def invalidate_coordination(
+    endpoint_id: str = None, coordination_uuid: str = None
+) -> None:
+    """Drop cached coordination definitions and agent templates; all without arguments."""
+
+    def matches(key: tuple) -> bool:
+        return endpoint_id in (None, key[0]) and coordination_uuid in (None, key[1])
+
+    coordinations.invalidate(matches)
+    agent_templates.invalidate(matches)
+
+
+def get_ask_openai_template(
+    endpoint_id: str, coordination_uuid: str, agent_name: str
+) -> Optional[Dict[str, Any]]:
+    """Return the cached askOpenAi variables of an agent, or None."""
+    return agent_templates.get((endpoint_id, coordination_uuid, agent_name))
+
+
+def cache_ask_openai_template(
+    endpoint_id: str, coordination_uuid: str, agent: Agent
+) -> Dict[str, Any]:
+    """Build the askOpenAi variables an agent shares across requests and keep them.
+
+    Callers merge their per-request variables into a copy of the template and
+    never modify it.
+    """
+    template = {}
+    if agent.agent_instructions:
+        template["instructions"] = agent.agent_instructions
+    if agent.response_format in ("auto", "text", "json_object"):
+        template["responseFormat"] = {"type": agent.response_format}
+    elif agent.response_format == "json_schema":
+        template["responseFormat"] = {
+            "type": "json_schema",
+            "json_schema": materialize(agent.json_schema or {}),
+        }
+    if agent.tools:
+        template["tools"] = materialize(agent.tools)
+
+    if agent.agent_name is not None:
+        agent_templates.set(
+            (endpoint_id, coordination_uuid, agent.agent_name), template
+        )
+    return template
 
 
 def get_coordination_thread(
     logger: logging.Logger,
     endpoint_id: str,
     setting: Dict[str, Any] = None,
+    fields: Tuple[str, ...] = None,
     **variables: Dict[str, Any],
-) -> Dict[str, Any]:
-    """Retrieve coordination thread details."""
+) -> Thread:
+    """Retrieve coordination thread details, only ``fields`` when given."""
     coordination_thread = execute_graphql_query(
         logger,
         endpoint_id,
@@ -179,8 +717,9 @@ def get_coordination_thread(
         "Query",
         variables,
         setting=setting,
+        fields=fields,
     )["thread"]
-    return humps.decamelize(coordination_thread)
+    return Thread.from_response(snake_case_view(coordination_thread))
 
 
 def get_ask_openai(
@@ -200,8 +739,9 @@ def get_ask_openai(
         variables,
         setting=setting,
         connection_id=connection_id,
+        fields=("functionName", "taskUuid", "threadId", "currentRunId"),
     )["askOpenAi"]
-    return humps.decamelize(ask_open_ai)
+    return snake_case_view(ask_open_ai)
 
 
 def get_current_run(
@@ -219,8 +759,9 @@ def get_current_run(
         "Query",
         variables,
         setting=setting,
+        fields=("status",),
     )["currentRun"]
-    return humps.decamelize(current_run)
+    return snake_case_view(current_run)
 
 
 def get_last_message(
@@ -238,14 +779,46 @@ def get_last_message(
         "Query",
         variables,
         setting=setting,
+        fields=("message",),
     )["lastMessage"]
-    return humps.decamelize(last_message)
+    return snake_case_view(last_message)
+
+
+def _query_all(table: Any, **query: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Run a DynamoDB query and follow LastEvaluatedKey through every page."""
+    items = []
+    while True:
+        response = table.query(**query)
+        items.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return items
+        query["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def _query_connections(
+    table: Any, endpoint_id: str, email: str
+) -> List[Dict[str, Any]]:
+    if wss_connections_email_index:
+        return _query_all(
+            table,
+            IndexName=wss_connections_email_index,
+            KeyConditionExpression=Key(wss_connections_email_attribute).eq(email),
+            FilterExpression=Attr("endpoint_id").eq(endpoint_id)
+            & Attr("status").eq("active"),
+        )
+    return _query_all(
+        table,
+        KeyConditionExpression=Key("endpoint_id").eq(endpoint_id),
+        FilterExpression=Attr("data.email").eq(email) & Attr("status").eq("active"),
+    )
 
 
-# Updated function to use Boto3 to get the latest connection by email without an index
 def get_connection_by_email(logger, endpoint_id: str, email: str) -> Optional[Dict]:
     """
-    Retrieve the latest connection by email from DynamoDB without relying on an index.
+    Retrieve the latest active connection by email from DynamoDB.
+
+    Uses the email index when one is configured, otherwise filters the
+    endpoint partition page by page. Recent hits are cached briefly.
 
     Args:
         logger: Logging object
@@ -256,29 +829,36 @@ def get_connection_by_email(logger, endpoint_id: str, email: str) -> Optional[Di
         Dict containing connection information or None if not found
     """
     try:
-        table = aws_dynamodb.Table("se-wss-connections")
+        connection = connections.get((endpoint_id, email))
+        if connection is not None:
+            return connection
 
-        # Query without using an index
-        response = table.query(
-            KeyConditionExpression=Key("endpoint_id").eq(endpoint_id),
-            FilterExpression=Attr("data.email").eq(email) & Attr("status").eq("active"),
-        )
+        table = get_aws_dynamodb().Table("se-wss-connections")
 
-        connections = response.get("Items", [])
+        with span(
+            logger,
+            "dynamodb",
+            function_name="se-wss-connections",
+            operation_name=wss_connections_email_index or "query",
+        ) as record:
+            items = _query_connections(table, endpoint_id, email)
+            record["items"] = len(items)
 
         # Sort connections manually by 'updated_at' if present
         latest_connection = None
-        if connections:
+        if items:
             latest_connection = max(
-                connections,
+                items,
                 key=lambda conn: conn.get("updated_at", "1970-01-01T00:00:00Z"),
             )
 
         if latest_connection:
-            return {
+            connection = {
                 "connection_id": latest_connection["connection_id"],
                 "data": latest_connection.get("data", {}),
             }
+            connections.set((endpoint_id, email), connection)
+            return connection
 
         logger.info(f"No active connection found for email: {email}")
         return None
@@ -294,16 +874,17 @@ def send_email(
 ) -> None:
     """Send an email with the given subject and body to the receiver's email address using AWS SES."""
     try:
-        response = aws_ses.send_email(
-            Source=source_email,
-            Destination={
-                "ToAddresses": [receiver_email],
-            },
-            Message={
-                "Subject": {"Data": subject, "Charset": "UTF-8"},
-                "Body": {"Text": {"Data": body, "Charset": "UTF-8"}},
-            },
-        )
+        with span(logger, "ses", operation_name="send_email", payload=body):
+            response = get_aws_ses().send_email(
+                Source=source_email,
+                Destination={
+                    "ToAddresses": [receiver_email],
+                },
+                Message={
+                    "Subject": {"Data": subject, "Charset": "UTF-8"},
+                    "Body": {"Text": {"Data": body, "Charset": "UTF-8"}},
+                },
+            )
         logger.info(f"Email sent to: {receiver_email}")
     except Exception as e:
         log = traceback.format_exc()
@@ -316,8 +897,12 @@ def insert_update_coordination_session(
     endpoint_id: str,
     setting: Dict[str, Any] = None,
     **variables: Dict[str, Any],
-) -> Dict[str, Any]:
-    """Insert or update the coordination session."""
+) -> Session:
+    """Insert or update the coordination session.
+
+    The session's coordination is read through the coordination cache.
+    """
+    coordination = coordinations.get((endpoint_id, variables["coordinationUuid"]))
     coordination_session = execute_graphql_query(
         logger,
         endpoint_id,
@@ -326,17 +911,38 @@ def insert_update_coordination_session(
         "Mutation",
         variables,
         setting=setting,
+        # The whole coordination is only selected when it is not cached.
+        fields=(
+            "session.sessionUuid",
+            "session.threadIds",
+            "session.status",
+            (
+                "session.coordination.coordinationUuid"
+                if coordination is not None
+                else "session.coordination"
+            ),
+        ),
     )["insertUpdateSession"]["session"]
-    return humps.decamelize(coordination_session)
+    coordination_session = Session.from_response(snake_case_view(coordination_session))
+    if coordination is not None:
+        coordination_session.coordination = coordination
+    else:
+        cache_coordination(endpoint_id, coordination_session.coordination)
+    return coordination_session
 
 
 def insert_update_coordination_thread(
     logger: logging.Logger,
     endpoint_id: str,
     setting: Dict[str, Any] = None,
+    fields: Tuple[str, ...] = None,
     **variables: Dict[str, Any],
-) -> Dict[str, Any]:
-    """Insert or update the coordination thread."""
+) -> Thread:
+    """Insert or update the coordination thread.
+
+    The response carries the fields of the coordination_thread query unless
+    other ``fields`` are given.
+    """
     coordination_thread = execute_graphql_query(
         logger,
         endpoint_id,
@@ -345,8 +951,46 @@ def insert_update_coordination_thread(
         "Mutation",
         variables,
         setting=setting,
+        fields=fields
+        or (
+            "thread.threadId",
+            "thread.status",
+            "thread.lastAssistantMessage",
+            "thread.log",
+            "thread.session.sessionUuid",
+            "thread.agent.agentName",
+        ),
     )["insertUpdateThread"]["thread"]
-    return humps.decamelize(coordination_thread)
+    coordination_thread = Thread.from_response(snake_case_view(coordination_thread))
+    if coordination_thread.session_uuid is not None:
+        cache_coordination_thread(endpoint_id, coordination_thread)
+    else:
+        coordination_threads.pop(
+            (endpoint_id, variables["sessionUuid"], variables["threadId"])
+        )
+    with coordination_thread_changed:
+        coordination_thread_changed.notify_all()
+    for listener in list(coordination_thread_listeners):
+        listener()
+    return coordination_thread
+
+
+def cache_coordination_thread(endpoint_id: str, coordination_thread: Thread) -> Thread:
+    """Keep a thread for the coordination_thread query for as long as its status allows."""
+    coordination_threads.set(
+        (
+            endpoint_id,
+            coordination_thread.session_uuid,
+            coordination_thread.thread_id,
+        ),
+        coordination_thread,
+        ttl=(
+            None
+            if coordination_thread.status in TERMINAL_THREAD_STATUSES
+            else coordination_thread_in_flight_ttl
+        ),
+    )
+    return coordination_thread
 
 
 def process_no_agent_name(
@@ -366,32 +1010,24 @@ def process_no_agent_name(
             },
         )
         variables = {
-            "assistantType": coordination_session["coordination"]["assistant_type"],
-            "assistantId": coordination_session["coordination"]["assistant_id"],
-            "threadId": coordination_session["thread_ids"][0],
+            "assistantType": coordination_session.coordination.assistant_type,
+            "assistantId": coordination_session.coordination.assistant_id,
+            "threadId": coordination_session.thread_ids[0],
             "userQuery": kwargs["user_query"],
             "updatedBy": "AI Operation Hub",
         }
     else:
-        coordination = get_coordination(
-            info.context.get("logger"),
-            info.context.get("endpoint_id"),
-            setting=info.context.get("setting"),
-            **{
-                "coordinationUuid": kwargs["coordination_uuid"],
-            },
-        )
         coordination_session = insert_update_coordination_session(
             info.context.get("logger"),
             info.context.get("endpoint_id"),
             setting=info.context.get("setting"),
             **{
-                "coordinationUuid": coordination["coordination_uuid"],
+                "coordinationUuid": kwargs["coordination_uuid"],
                 "updatedBy": "AI Operation Hub",
             },
         )
         variables = {
-            "assistantId": coordination_session["coordination"]["assistant_id"],
+            "assistantId": coordination_session.coordination.assistant_id,
             "userQuery": f"Please allocate the assigned agent for the user's query ({kwargs['user_query']}) with coordination_uuid ({kwargs['coordination_uuid']}).",
             "updatedBy": "AI Operation Hub",
         }
@@ -404,13 +1040,26 @@ def process_no_agent_name(
         **variables,
     )
 
+    run = Run(
+        session_uuid=coordination_session.session_uuid,
+        coordination_uuid=coordination_session.coordination.coordination_uuid,
+        function_name=ask_openai["function_name"],
+        task_uuid=ask_openai["task_uuid"],
+        assistant_id=coordination_session.coordination.assistant_id,
+        thread_id=ask_openai["thread_id"],
+        run_id=ask_openai["current_run_id"],
+    )
+    expect_run_completed_event(
+        info.context.get("endpoint_id"), run, setting=info.context.get("setting")
+    )
+
     variables = {
-        "sessionUuid": coordination_session["session_uuid"],
+        "sessionUuid": coordination_session.session_uuid,
         "threadId": ask_openai["thread_id"],
-        "coordinationUuid": coordination_session["coordination"]["coordination_uuid"],
+        "coordinationUuid": coordination_session.coordination.coordination_uuid,
         "updatedBy": "AI Operation Hub",
     }
-    if coordination_session["status"] == "in_transit":
+    if coordination_session.status == "in_transit":
         variables.update(
             {
                 "agentName": "null",
@@ -431,45 +1080,31 @@ def process_no_agent_name(
     ## Update the last assistant message in coordination thread.
     ## Update the status to be 'assigned' or 'unassigned'.
 
-    Utility.invoke_funct_on_aws_lambda(
+    dispatch_run_completion(
         info.context.get("logger"),
         info.context.get("endpoint_id"),
-        "async_update_coordination_thread",
-        params={
-            "session_uuid": coordination_session["session_uuid"],
-            "coordination_uuid": coordination_session["coordination"][
-                "coordination_uuid"
-            ],
-            "function_name": ask_openai["function_name"],
-            "task_uuid": ask_openai["task_uuid"],
-            "assistant_id": coordination_session["coordination"]["assistant_id"],
-            "thread_id": ask_openai["thread_id"],
-            "run_id": ask_openai["current_run_id"],
-        },
+        run,
         setting=info.context.get("setting"),
-        test_mode=test_mode,
-        aws_lambda=aws_lambda,
-    )
-
-    return AskOperationAgentType(
-        coordination=coordination_session["coordination"],
-        session_uuid=coordination_session["session_uuid"],
-        thread_id=coordination_thread["thread_id"],
-        agent_name=(
-            coordination_thread["agent"]["agent_name"]
-            if coordination_thread["agent"] is not None
-            else None
-        ),
-        last_assistant_message=coordination_thread["last_assistant_message"],
-        status=coordination_thread["status"],
-        log=coordination_thread["log"],
     )
 
+    return coordination_thread.to_ask_operation_agent_type(coordination_session)
+
 
 def process_with_agent_name(
     info: ResolveInfo, **kwargs: Dict[str, Any]
 ) -> AskOperationAgentType:
     """Handle case when agent_name is provided."""
+    # The receiver lookup only needs the request, so it overlaps the session
+    # and thread hops and is joined right before askOpenAi.
+    receiver_connection = None
+    if "receiver_email" in kwargs:
+        receiver_connection = submit(
+            get_connection_by_email,
+            info.context.get("logger"),
+            info.context.get("endpoint_id"),
+            email=kwargs["receiver_email"],
+        )
+
     variables = {
         "coordinationUuid": kwargs["coordination_uuid"],
         "sessionUuid": kwargs["session_uuid"],
@@ -484,262 +1119,623 @@ def process_with_agent_name(
         **variables,
     )
 
+    # The whole agent is only selected to build a missing askOpenAi template.
+    template = get_ask_openai_template(
+        info.context.get("endpoint_id"),
+        coordination_session.coordination.coordination_uuid,
+        kwargs["agent_name"],
+    )
+    agent_fields = ("agent.agentName",) if template is not None else ("agent",)
+
     coordination_thread = get_coordination_thread(
         info.context.get("logger"),
         info.context.get("endpoint_id"),
         setting=info.context.get("setting"),
+        # The state fields let the write buffer drop no-op writes.
+        fields=("threadId", "status", "lastAssistantMessage", "log") + agent_fields,
         **{
             "sessionUuid": kwargs["session_uuid"],
-            "threadId": coordination_session["thread_ids"][0],
+            "threadId": coordination_session.thread_ids[0],
         },
     )
 
-    if coordination_thread["status"] != "assigned":
-        variables = {
-            "sessionUuid": kwargs["session_uuid"],
-            "threadId": coordination_session["thread_ids"][0],
-            "coordinationUuid": coordination_session["coordination"][
-                "coordination_uuid"
-            ],
-            "agentName": kwargs["agent_name"],
-            "status": "assigned",
-            "log": "null",
-            "updatedBy": "AI Operation Hub",
-        }
-        coordination_thread = insert_update_coordination_thread(
+    # The assign and dispatch writes are merged into one mutation where the
+    # flow allows it.
+    thread_writes = ThreadWriteBuffer(
+        lambda fields=None, **variables: insert_update_coordination_thread(
             info.context.get("logger"),
             info.context.get("endpoint_id"),
             setting=info.context.get("setting"),
+            fields=fields,
             **variables,
-        )
+        ),
+        known=coordination_thread,
+    )
+    thread_writes.update(
+        sessionUuid=kwargs["session_uuid"],
+        threadId=coordination_session.thread_ids[0],
+        coordinationUuid=coordination_session.coordination.coordination_uuid,
+        updatedBy="AI Operation Hub",
+    )
 
-    variables = {
-        # "assistantType": coordination_session["coordination"]["assistant_type"],
-        "assistantId": coordination_session["coordination"]["assistant_id"],
-        "threadId": coordination_thread["thread_id"],
-        "userQuery": kwargs["user_query"],
-        "updatedBy": "AI Operation Hub",
-    }
+    try:
+        if coordination_thread.status != "assigned":
+            thread_writes.update(
+                agentName=kwargs["agent_name"], status="assigned", log="null"
+            )
+        if coordination_thread.agent_name != kwargs["agent_name"]:
+            # The newly assigned agent feeds the askOpenAi template, so it is
+            # written before the call.
+            coordination_thread = thread_writes.flush(
+                fields=(
+                    "thread.threadId",
+                    "thread.status",
+                    "thread.lastAssistantMessage",
+                    "thread.log",
+                    "thread.session.sessionUuid",
+                )
+                + tuple(f"thread.{field}" for field in agent_fields)
+            )
 
-    # New logic to handle receiver_email
-    connection_id = info.context.get("connectionId")
-    if "receiver_email" in kwargs:
-        # Attempt to find connection_id for the receiver's email
-        receiver_connection = get_connection_by_email(
+        # New logic to handle receiver_email
+        connection_id = info.context.get("connectionId")
+        if receiver_connection is not None:
+            # Attempt to find connection_id for the receiver's email
+            receiver_connection = receiver_connection.result()
+
+            if receiver_connection:
+                connection_id = receiver_connection.get("connection_id", connection_id)
+
+        # The agent part of the variables is shared through the template
+        # cache; the assistant comes with the session's coordination.
+        if template is None:
+            template = cache_ask_openai_template(
+                info.context.get("endpoint_id"),
+                coordination_session.coordination.coordination_uuid,
+                coordination_thread.agent or Agent(),
+            )
+        variables = dict(
+            template,
+            assistantId=coordination_session.coordination.assistant_id,
+            threadId=coordination_thread.thread_id,
+            userQuery=kwargs["user_query"],
+            updatedBy="AI Operation Hub",
+        )
+        if coordination_session.coordination.additional_instructions:
+            variables["additionalInstructions"] = (
+                coordination_session.coordination.additional_instructions
+            )
+        # Streaming relays the deltas to the WebSocket connection as they are
+        # generated; without a connection there is nobody to relay them to.
+        if kwargs.get("stream"):
+            if connection_id is None:
+                info.context.get("logger").info(
+                    "No connection to stream to; waiting for the completed run instead."
+                )
+            elif "stream" not in get_graphql_operation_arguments(
+                info.context.get("logger"),
+                info.context.get("endpoint_id"),
+                "openai_assistant_graphql",
+                "askOpenAi",
+                "Query",
+                setting=info.context.get("setting"),
+            ):
+                info.context.get("logger").warning(
+                    "askOpenAi of openai_assistant_graphql takes no stream argument; waiting for the completed run instead."
+                )
+            else:
+                variables["stream"] = True
+
+        ask_openai = get_ask_openai(
             info.context.get("logger"),
             info.context.get("endpoint_id"),
-            email=kwargs["receiver_email"],
+            setting=info.context.get("setting"),
+            connection_id=connection_id,
+            **variables,
         )
 
-        if receiver_connection:
-            connection_id = receiver_connection.get("connection_id", connection_id)
-
-    agent = coordination_thread.get("agent", {})
-    if agent.get("agent_instructions"):
-        variables["instructions"] = agent["agent_instructions"]
-    if agent.get("response_format"):
-        if agent["response_format"] == "auto":
-            variables["responseFormat"] = {"type": "auto"}
-        elif agent["response_format"] == "text":
-            variables["responseFormat"] = {"type": "text"}
-        elif agent["response_format"] == "json_object":
-            variables["responseFormat"] = {"type": "json_object"}
-        elif agent["response_format"] == "json_schema":
-            variables["responseFormat"] = {
-                "type": "json_schema",
-                "json_schema": agent.get("json_schema", {}),
-            }
-    if agent.get("tools"):
-        variables["tools"] = agent["tools"]
-    if coordination_session["coordination"].get("additional_instructions"):
-        variables["additionalInstructions"] = coordination_session["coordination"][
-            "additional_instructions"
-        ]
+        run = Run(
+            session_uuid=coordination_session.session_uuid,
+            coordination_uuid=coordination_session.coordination.coordination_uuid,
+            agent_name=kwargs["agent_name"],
+            function_name=ask_openai["function_name"],
+            task_uuid=ask_openai["task_uuid"],
+            assistant_id=coordination_session.coordination.assistant_id,
+            thread_id=ask_openai["thread_id"],
+            run_id=ask_openai["current_run_id"],
+        )
 
-    ask_openai = get_ask_openai(
+        # If connection_id is not found and receiver_email is provided, an email will be sent out.
+        if connection_id is None and "receiver_email" in kwargs:
+            run.receiver_email = kwargs["receiver_email"]
+
+        expect_run_completed_event(
+            info.context.get("endpoint_id"), run, setting=info.context.get("setting")
+        )
+
+        thread_writes.update(
+            threadId=ask_openai["thread_id"],
+            lastAssistantMessage="null",
+            status="dispatched",
+        )
+    except Exception:
+        # Keep the assignment the request got to before failing.
+        thread_writes.flush()
+        raise
+
+    coordination_thread = thread_writes.flush()
+
+    ## Process OpenAI response asynchronously and save the results.
+    ## Update the last assistant message in coordination thread.
+    ## Update the status to be 'completed'.
+
+    dispatch_run_completion(
         info.context.get("logger"),
         info.context.get("endpoint_id"),
+        run,
         setting=info.context.get("setting"),
-        connection_id=connection_id,
-        **variables,
     )
 
-    variables = {
-        "sessionUuid": coordination_session["session_uuid"],
-        "threadId": ask_openai["thread_id"],
-        "coordinationUuid": coordination_session["coordination"]["coordination_uuid"],
-        "lastAssistantMessage": "null",
-        "status": "dispatched",
+    return coordination_thread.to_ask_operation_agent_type(coordination_session)
+
+
+def _current_run_variables(run: Run) -> Dict[str, Any]:
+    return {
+        "functionName": run.function_name,
+        "taskUuid": run.task_uuid,
+        "assistantId": run.assistant_id,
+        "threadId": run.thread_id,
+        "runId": run.run_id,
         "updatedBy": "AI Operation Hub",
     }
-    coordination_thread = insert_update_coordination_thread(
-        info.context.get("logger"),
-        info.context.get("endpoint_id"),
-        setting=info.context.get("setting"),
-        **variables,
-    )
 
-    ## Process OpenAI response asynchronously and save the results.
-    ## Update the last assistant message in coordination thread.
-    ## Update the status to be 'completed'.
 
-    params = {
-        "session_uuid": coordination_session["session_uuid"],
-        "coordination_uuid": coordination_session["coordination"]["coordination_uuid"],
-        "agent_name": kwargs["agent_name"],
-        "function_name": ask_openai["function_name"],
-        "task_uuid": ask_openai["task_uuid"],
-        "assistant_id": coordination_session["coordination"]["assistant_id"],
-        "thread_id": ask_openai["thread_id"],
-        "run_id": ask_openai["current_run_id"],
-    }
+def poll_current_run(
+    logger: logging.Logger,
+    endpoint_id: str,
+    run: Run,
+    setting: Dict[str, Any] = None,
+) -> Dict[str, Any]:
+    """Fetch the current state of a dispatched run."""
+    return get_current_run(
+        logger, endpoint_id, setting=setting, **_current_run_variables(run)
+    )
 
-    # If connection_id is not found and receiver_email is provided, an email will be sent out.
-    if connection_id is None and "receiver_email" in kwargs:
-        params["receiver_email"] = kwargs["receiver_email"]
 
-    Utility.invoke_funct_on_aws_lambda(
-        info.context.get("logger"),
-        info.context.get("endpoint_id"),
-        "async_update_coordination_thread",
-        params=params,
-        setting=info.context.get("setting"),
-        test_mode=test_mode,
-        aws_lambda=aws_lambda,
-    )
-
-    return AskOperationAgentType(
-        coordination=coordination_session["coordination"],
-        session_uuid=coordination_session["session_uuid"],
-        thread_id=coordination_thread["thread_id"],
-        agent_name=(
-            coordination_thread["agent"]["agent_name"]
-            if coordination_thread["agent"] is not None
-            else None
-        ),
-        last_assistant_message=coordination_thread["last_assistant_message"],
-        status=coordination_thread["status"],
-        log=coordination_thread["log"],
+def poll_current_runs(
+    logger: logging.Logger,
+    endpoint_id: str,
+    runs: List[Run],
+    setting: Dict[str, Any] = None,
+) -> List[Dict[str, Any]]:
+    """Fetch the current state of several dispatched runs in one round-trip."""
+    results = execute_graphql_queries(
+        logger,
+        endpoint_id,
+        "openai_assistant_graphql",
+        [
+            ("currentRun", "Query", _current_run_variables(run), ("status",))
+            for run in runs
+        ],
+        setting=setting,
     )
+    return [snake_case_view(result["currentRun"]) for result in results]
 
 
-def async_update_coordination_thread_handler(
-    logger: logging.Logger, **kwargs: Dict[str, Any]
-) -> Any:
-    """Handle asynchronous update of coordination thread."""
-    try:
-        # Record the start time
-        start_time = time.time()
+def wait_for_run_completion(
+    logger: logging.Logger,
+    endpoint_id: str,
+    run: Run,
+    setting: Dict[str, Any] = None,
+) -> Dict[str, Any]:
+    """Poll the current run until it completes or the deadline passes."""
+    setting = setting or {}
+    deadline = float(setting.get("run_poll_deadline", 300))
+    start_time = time.time()
+    intervals = run_poll_intervals(setting)
+    polls = 0
+    while True:
+        current_run = poll_current_run(logger, endpoint_id, run, setting=setting)
+        polls += 1
+        elapsed_time = time.time() - start_time
+        if current_run["status"] == "completed":
+            record_run(logger, run.run_id, polls, elapsed_time, "completed")
+            return dict(current_run, polls=polls)
+
+        if current_run["status"] in RUN_FAILED_STATUSES:
+            record_run(logger, run.run_id, polls, elapsed_time, current_run["status"])
+            raise Exception(
+                f"Run {run.run_id} ended with status '{current_run['status']}' after {polls} polls."
+            )
 
-        endpoint_id = kwargs.get("endpoint_id")
-        setting = kwargs.get("setting")
-        while True:
-            current_run = get_current_run(
-                logger,
-                endpoint_id,
-                setting=setting,
-                **{
-                    "functionName": kwargs["function_name"],
-                    "taskUuid": kwargs["task_uuid"],
-                    "assistantId": kwargs["assistant_id"],
-                    "threadId": kwargs["thread_id"],
-                    "runId": kwargs["run_id"],
-                    "updatedBy": "AI Operation Hub",
-                },
+        remaining_time = deadline - elapsed_time
+        if remaining_time <= 0:
+            record_run(logger, run.run_id, polls, elapsed_time, "timeout")
+            raise Exception(
+                f"Operation timed out after {deadline:.0f} seconds and {polls} polls."
             )
-            if current_run["status"] == "completed":
-                break
 
-            # Check if the time elapsed exceeds 5 minutes (300 seconds)
-            elapsed_time = time.time() - start_time
-            if elapsed_time > 300:
-                raise Exception("Operation timed out after 5 minutes.")
+        # Never sleep past the deadline; the last poll lands right on it.
+        time.sleep(min(next(intervals), remaining_time))
+
+
+def register_pending_run(run: Run) -> None:
+    """Remember a dispatched run until it is finalised."""
+    params = run.to_dict()
+    params.update(
+        endpoint_id=run.endpoint_id, dispatched_at=run.dispatched_at or time.time()
+    )
+    pending_runs.set(run.run_id, params)
+
+
+def pop_pending_run(run_id: str) -> Optional[Run]:
+    """Take a dispatched run out of the pending table."""
+    params = pending_runs.pop(run_id)
+    return Run.from_dict(params) if params is not None else None
+
+
+def load_pending_runs() -> List[Run]:
+    """Return every run waiting in the pending table."""
+    return [
+        Run.from_dict(params)
+        for key, params in pending_runs.items()
+        if key != RUN_POLLER_LEASE
+    ]
 
-            # Optional: Sleep for a short duration to prevent excessive looping
-            time.sleep(1)
 
-        last_message = get_last_message(
+def expect_run_completed_event(
+    endpoint_id: str, run: Run, setting: Dict[str, Any] = None
+) -> None:
+    """In event mode, register a run before its thread is written as dispatched,
+    so a completion event arriving right away finds it."""
+    if (setting or {}).get("run_completion_mode") == "event":
+        run.endpoint_id = endpoint_id
+        register_pending_run(run)
+
+
+def invoke_event(
+    logger: logging.Logger,
+    endpoint_id: str,
+    function_name: str,
+    params: Dict[str, Any],
+    setting: Dict[str, Any] = None,
+) -> None:
+    """Invoke an Event function of this engine asynchronously."""
+    with span(logger, "lambda", function_name=function_name, payload=params):
+        Utility.invoke_funct_on_aws_lambda(
             logger,
             endpoint_id,
+            function_name,
+            params=params,
             setting=setting,
-            **{
-                "assistantId": kwargs["assistant_id"],
-                "threadId": kwargs["thread_id"],
-                "role": "assistant",
-            },
+            test_mode=test_mode,
+            aws_lambda=get_aws_lambda(),
         )
 
-        variables = {
-            "sessionUuid": kwargs["session_uuid"],
-            "coordinationUuid": kwargs["coordination_uuid"],
-            "threadId": kwargs["thread_id"],
-            "updatedBy": "AI Operation Hub",
-        }
 
-        if "agent_name" in kwargs:
-            variables.update(
-                {
-                    "agentName": kwargs["agent_name"],
-                    "lastAssistantMessage": last_message["message"],
-                    "status": "completed",
-                }
-            )
-        else:
-            response = Utility.json_loads(last_message["message"])
-            variables.update(
-                {
-                    "agentName": (
-                        response["agent_name"]
-                        if response["status"] == "assigned"
-                        else None
-                    ),
-                    "lastAssistantMessage": (
-                        response["message"]
-                        if response["status"] == "unassigned"
-                        else None
-                    ),
-                    "status": response["status"],
-                }
-            )
+def start_pending_runs_sweep(
+    logger: logging.Logger, endpoint_id: str, setting: Dict[str, Any] = None
+) -> None:
+    """Invoke poll_pending_runs unless an invocation already holds the lease."""
+    lease_ttl = float((setting or {}).get("run_poller_lease_ttl", 60))
+    if pending_runs.add(RUN_POLLER_LEASE, {"endpoint_id": endpoint_id}, ttl=lease_ttl):
+        invoke_event(logger, endpoint_id, "poll_pending_runs", {}, setting=setting)
+
 
-        coordination_thread = insert_update_coordination_thread(
+def dispatch_run_completion(
+    logger: logging.Logger,
+    endpoint_id: str,
+    run: Run,
+    setting: Dict[str, Any] = None,
+) -> None:
+    """Hand a dispatched run over to the configured completion path."""
+    run.endpoint_id = endpoint_id
+    run_completion_mode = (setting or {}).get("run_completion_mode")
+    if run_completion_mode == "event":
+        # The assistant engine pushes "on_run_completed" when the run is done;
+        # the run was registered by expect_run_completed_event.
+        if pending_runs.get(run.run_id) is None:
+            # The event was handled before the dispatched write, which then
+            # overwrote the finalised thread; write the outcome again.
+            current_run = poll_current_run(logger, endpoint_id, run, setting=setting)
+            if current_run["status"] == "completed":
+                finalize_coordination_thread(logger, endpoint_id, run, setting=setting)
+            else:
+                fail_coordination_thread(
+                    logger,
+                    endpoint_id,
+                    run,
+                    f"Run {run.run_id} ended with status '{current_run['status']}'.",
+                    setting=setting,
+                )
+            return
+        # Runs whose event is overdue are polled by the sweep.
+        start_pending_runs_sweep(logger, endpoint_id, setting=setting)
+        return
+    if run_completion_mode == "poller":
+        if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") is None:
+            poller = get_run_poller(logger, setting=setting)
+            poller.add(run)
+            poller.start()
+            return
+        # A Lambda container is frozen after the response, so the run waits in
+        # the shared pending table for the one poll_pending_runs invocation
+        # that sweeps it.
+        register_pending_run(run)
+        start_pending_runs_sweep(logger, endpoint_id, setting=setting)
+        return
+
+    invoke_event(
+        logger,
+        endpoint_id,
+        "async_update_coordination_thread",
+        run.to_dict(),
+        setting=setting,
+    )
+
+
+def finalize_coordination_thread(
+    logger: logging.Logger,
+    endpoint_id: str,
+    run: Run,
+    setting: Dict[str, Any] = None,
+) -> Thread:
+    """Save the last assistant message of a completed run to the coordination thread."""
+    last_message = get_last_message(
+        logger,
+        endpoint_id,
+        setting=setting,
+        **{
+            "assistantId": run.assistant_id,
+            "threadId": run.thread_id,
+            "role": "assistant",
+        },
+    )
+
+    variables = {
+        "sessionUuid": run.session_uuid,
+        "coordinationUuid": run.coordination_uuid,
+        "threadId": run.thread_id,
+        "updatedBy": "AI Operation Hub",
+    }
+
+    if run.agent_name is not None:
+        variables.update(
+            {
+                "agentName": run.agent_name,
+                "lastAssistantMessage": last_message["message"],
+                "status": "completed",
+            }
+        )
+    else:
+        response = Utility.json_loads(last_message["message"])
+        variables.update(
+            {
+                "agentName": (
+                    response["agent_name"] if response["status"] == "assigned" else None
+                ),
+                "lastAssistantMessage": (
+                    response["message"] if response["status"] == "unassigned" else None
+                ),
+                "status": response["status"],
+            }
+        )
+
+    coordination_thread = insert_update_coordination_thread(
+        logger,
+        endpoint_id,
+        setting=setting,
+        **variables,
+    )
+
+    # Send email if receiver_email is in the run
+    if run.receiver_email is not None:
+        send_email(
             logger,
-            endpoint_id,
-            setting=setting,
-            **variables,
+            receiver_email=run.receiver_email,
+            subject="Coordination Thread Update",
+            body=f"The coordination thread with ID {run.thread_id} has been updated successfully. Last assistant message: \n\n {last_message['message']}",
         )
 
-        # Send email if receiver_email is in kwargs
-        if "receiver_email" in kwargs:
-            send_email(
-                logger,
-                receiver_email=kwargs["receiver_email"],
-                subject="Coordination Thread Update",
-                body=f"The coordination thread with ID {kwargs['thread_id']} has been updated successfully. Last assistant message: \n\n {last_message['message']}",
-            )
+    return coordination_thread
+
+
+def fail_coordination_thread(
+    logger: logging.Logger,
+    endpoint_id: str,
+    run: Run,
+    log: str,
+    setting: Dict[str, Any] = None,
+) -> Thread:
+    """Mark the coordination thread of a run as failed."""
+    variables = {
+        "sessionUuid": run.session_uuid,
+        "coordinationUuid": run.coordination_uuid,
+        "threadId": run.thread_id,
+        "status": "fail",
+        "log": log,
+        "updatedBy": "AI Operation Hub",
+    }
+    return insert_update_coordination_thread(
+        logger,
+        endpoint_id,
+        setting=setting,
+        **variables,
+    )
+
+
+def new_run_poller(
+    logger: logging.Logger, setting: Dict[str, Any] = None, pending: bool = False
+) -> RunPoller:
+    """Build a run poller that finalises runs with the shared thread updates.
+
+    With ``pending``, the runs come from the pending table and leave it when
+    they are finalised or fail; a run another container already took out of
+    the table is not finalised again.
+    """
+
+    def finalize_run(run: Run) -> None:
+        if not pending or pop_pending_run(run.run_id) is not None:
+            finalize_coordination_thread(logger, run.endpoint_id, run, setting=setting)
+
+    def fail_run(run: Run, log: str) -> None:
+        if pending:
+            pending_runs.delete(run.run_id)
+        fail_coordination_thread(logger, run.endpoint_id, run, log, setting=setting)
+
+    return RunPoller(
+        logger,
+        poll_runs=lambda runs: poll_current_runs(
+            logger, runs[0].endpoint_id, runs, setting=setting
+        ),
+        finalize_run=finalize_run,
+        fail_run=fail_run,
+        setting=setting,
+    )
+
+
+def get_run_poller(logger: logging.Logger, setting: Dict[str, Any] = None) -> RunPoller:
+    """Return the long-lived run poller of this process."""
+    global run_poller
+    with run_poller_lock:
+        if run_poller is None:
+            run_poller = new_run_poller(logger, setting=setting)
+        return run_poller
+
 
+def async_update_coordination_thread_handler(
+    logger: logging.Logger, **kwargs: Dict[str, Any]
+) -> Any:
+    """Handle asynchronous update of coordination thread."""
+    endpoint_id = kwargs.get("endpoint_id")
+    setting = kwargs.get("setting")
+    run = Run.from_dict(kwargs)
+    try:
+        wait_for_run_completion(logger, endpoint_id, run, setting=setting)
+        finalize_coordination_thread(logger, endpoint_id, run, setting=setting)
         return
 
     except Exception as e:
         log = traceback.format_exc()
         logger.error(log)
-        variables = {
-            "sessionUuid": kwargs["session_uuid"],
-            "coordinationUuid": kwargs["coordination_uuid"],
-            "threadId": kwargs["thread_id"],
-            "status": "fail",
-            "log": log,
-            "updatedBy": "AI Operation Hub",
-        }
-        coordination_thread = insert_update_coordination_thread(
-            logger,
-            endpoint_id,
-            setting=setting,
-            **variables,
+        fail_coordination_thread(logger, endpoint_id, run, log, setting=setting)
+        raise e
+
+
+def run_completed_handler(logger: logging.Logger, **kwargs: Dict[str, Any]) -> Any:
+    """Finalise the coordination thread of a run from its completion event."""
+    endpoint_id = kwargs.get("endpoint_id")
+    setting = kwargs.get("setting")
+
+    # Context registered at dispatch time is completed by the event payload.
+    # A shared store may take a moment to show a fresh entry, so a missing one
+    # is read again a few times.
+    retries = int((setting or {}).get("run_completed_retries", 3))
+    run = pop_pending_run(kwargs["run_id"])
+    for _ in range(retries):
+        if run is not None:
+            break
+        time.sleep(float((setting or {}).get("run_completed_retry_interval", 0.2)))
+        run = pop_pending_run(kwargs["run_id"])
+    run = run or Run()
+    run.update(kwargs)
+    missing = [
+        key
+        for key in ("session_uuid", "coordination_uuid", "assistant_id", "thread_id")
+        if getattr(run, key) is None
+    ]
+    if missing:
+        raise Exception(
+            f"Cannot finalise run {kwargs['run_id']}, missing: {', '.join(missing)}."
         )
+
+    try:
+        if (run.status or "completed") != "completed":
+            raise Exception(f"Run {run.run_id} ended with status '{run.status}'.")
+        finalize_coordination_thread(logger, endpoint_id, run, setting=setting)
+        return
+
+    except Exception as e:
+        log = traceback.format_exc()
+        logger.error(log)
+        fail_coordination_thread(logger, endpoint_id, run, log, setting=setting)
         raise e
 
 
+def poll_pending_runs_handler(logger: logging.Logger, **kwargs: Dict[str, Any]) -> Any:
+    """Poll the runs of the pending table in one worker until none is left.
+
+    Runs while holding the lease claimed by start_pending_runs_sweep and hands
+    over to a fresh invocation after run_poller_max_runtime seconds.
+    """
+    endpoint_id = kwargs.get("endpoint_id")
+    setting = kwargs.get("setting") or {}
+    lease_ttl = float(setting.get("run_poller_lease_ttl", 60))
+    sweep_interval = float(setting.get("run_poller_sweep_interval", 2))
+    # In event mode a run is only polled once its completion event is overdue.
+    grace = (
+        float(setting.get("run_completion_event_timeout", 120))
+        if setting.get("run_completion_mode") == "event"
+        else 0
+    )
+    stop_at = time.time() + float(setting.get("run_poller_max_runtime", 600))
+    poller = new_run_poller(logger, setting=setting, pending=True)
+    while True:
+        pending_runs.set(RUN_POLLER_LEASE, {"endpoint_id": endpoint_id}, ttl=lease_ttl)
+        runs = load_pending_runs()
+        waiting = []
+        for run in runs:
+            if run.run_id in poller:
+                continue
+            if run.dispatched_at + grace <= time.time():
+                poller.add(run, dispatched_at=run.dispatched_at)
+            else:
+                waiting.append(run.dispatched_at + grace)
+
+        if not runs and not poller.pending():
+            pending_runs.delete(RUN_POLLER_LEASE)
+            # A run registered before the lease was released did not start a
+            # sweep, so look once more before leaving.
+            if not load_pending_runs() or not pending_runs.add(
+                RUN_POLLER_LEASE, {"endpoint_id": endpoint_id}, ttl=lease_ttl
+            ):
+                return
+            continue
+
+        if time.time() >= stop_at:
+            # The lease is kept for the next invocation.
+            invoke_event(logger, endpoint_id, "poll_pending_runs", {}, setting=setting)
+            return
+
+        poller.poll_round()
+        if poller.pending() or not waiting:
+            poller.wait(sweep_interval)
+        else:
+            # Nothing to poll until the next event is overdue; keep the lease.
+            poller.wait(
+                min(max(min(waiting) - time.time(), sweep_interval), lease_ttl / 2)
+            )
+
+
+def process_ask_operation_agent(
+    info: ResolveInfo, **kwargs: Dict[str, Any]
+) -> AskOperationAgentType:
+    if "agent_name" in kwargs:
+        return process_with_agent_name(info, **kwargs)
+    else:
+        return process_no_agent_name(info, **kwargs)
+
+
+def _ask_operation_agent_values(
+    ask_operation_agent: AskOperationAgentType,
+) -> Dict[str, Any]:
+    # Plain values, so the replay store can serialise them.
+    return {
+        field: getattr(ask_operation_agent, field)
+        for field in AskOperationAgentType._meta.fields
+    }
+
+
 def resolve_ask_operation_agent_handler(
     info: ResolveInfo, **kwargs: Dict[str, Any]
 ) -> AskOperationAgentType:
@@ -753,10 +1749,34 @@ def resolve_ask_operation_agent_handler(
             info.context["endpoint_id"] = endpoint_id
         ##<--Testing Data-->##
 
-        if "agent_name" in kwargs:
-            return process_with_agent_name(info, **kwargs)
-        else:
-            return process_no_agent_name(info, **kwargs)
+        # Without a session or a client key two calls cannot be told apart
+        # from two genuine requests, so they are not de-duplicated.
+        idempotency_key = kwargs.pop("idempotency_key", None)
+        if kwargs.get("session_uuid") is None and idempotency_key is None:
+            return process_ask_operation_agent(info, **kwargs)
+
+        # The query text is used as sent: folding case or whitespace would
+        # merge distinct messages, e.g. "Yes" and "yes" to different prompts.
+        key = single_flight_key(
+            info.context.get("endpoint_id"),
+            kwargs["coordination_uuid"],
+            kwargs.get("session_uuid"),
+            kwargs.get("agent_name"),
+            kwargs.get("receiver_email"),
+            bool(kwargs.get("stream")),
+            kwargs["user_query"],
+            idempotency_key,
+        )
+        # Only a client key marks a later call as a retry of a finished one;
+        # a user may well send the same message twice in a session.
+        ask_operation_agent = ask_operation_agent_flights.do(
+            key,
+            lambda: _ask_operation_agent_values(
+                process_ask_operation_agent(info, **kwargs)
+            ),
+            replay=idempotency_key is not None,
+        )
+        return AskOperationAgentType(**ask_operation_agent)
 
     except Exception as e:
         log = traceback.format_exc()
@@ -764,32 +1784,197 @@ def resolve_ask_operation_agent_handler(
         raise e
 
 
-def resolve_coordination_thread_handler(
+def resolve_ask_operation_agents_handler(
     info: ResolveInfo, **kwargs: Dict[str, Any]
-) -> CoordinationThreadType:
+) -> List[AskOperationAgentResultType]:
+    """Run a batch of ask_operation_agent inputs with bounded concurrency."""
     try:
-        coordination_thread = get_coordination_thread(
+        ## Test the waters 🧪 before diving in!
+        ##<--Testing Data-->##
+        global connection_id, endpoint_id
+        if info.context.get("connectionId") is None:
+            info.context["connectionId"] = connection_id
+        if info.context.get("endpoint_id") is None:
+            info.context["endpoint_id"] = endpoint_id
+        ##<--Testing Data-->##
+
+        setting = info.context.get("setting") or {}
+        max_inputs = int(setting.get("ask_operation_agents_max_inputs", 50))
+        if len(kwargs["inputs"]) > max_inputs:
+            raise Exception(
+                f"ask_operation_agents takes at most {max_inputs} inputs, got {len(kwargs['inputs'])}."
+            )
+        inputs = [
+            {key: value for key, value in item.items() if value is not None}
+            for item in kwargs["inputs"]
+        ]
+        if not inputs:
+            return []
+        # The setting caps the concurrency a client may ask for.
+        concurrency = int(setting.get("ask_operation_agents_concurrency", 4))
+        max_concurrency = min(kwargs.get("max_concurrency") or concurrency, concurrency)
+
+        # Resolve the schemas once for the whole batch instead of once per item.
+        prefetches = [
+            submit(
+                fetch_graphql_schema,
+                info.context.get("logger"),
+                info.context.get("endpoint_id"),
+                function_name,
+                setting=info.context.get("setting"),
+            )
+            for function_name in ("ai_coordination_graphql", "openai_assistant_graphql")
+        ]
+        for prefetch in prefetches:
+            try:
+                prefetch.result()
+            except Exception:
+                # The item that needs it reports the error.
+                info.context.get("logger").warning(traceback.format_exc())
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(max_concurrency, len(inputs))),
+            thread_name_prefix="ask-operation-agents",
+        ) as pool:
+            futures = [
+                pool.submit(
+                    contextvars.copy_context().run,
+                    resolve_ask_operation_agent_handler,
+                    info,
+                    **item,
+                )
+                for item in inputs
+            ]
+
+        results = []
+        for index, future in enumerate(futures):
+            try:
+                results.append(
+                    AskOperationAgentResultType(index=index, result=future.result())
+                )
+            except Exception as e:
+                results.append(AskOperationAgentResultType(index=index, error=str(e)))
+        return results
+
+    except Exception as e:
+        log = traceback.format_exc()
+        info.context.get("logger").error(log)
+        raise e
+
+
+def read_coordination_thread(
+    info: ResolveInfo, session_uuid: str, thread_id: str, cached: bool = True
+) -> Thread:
+    """Read a thread for the coordination_thread query, from the cache when ``cached``."""
+    if cached:
+        coordination_thread = coordination_threads.get(
+            (info.context.get("endpoint_id"), session_uuid, thread_id)
+        )
+        if coordination_thread is not None:
+            return coordination_thread
+    return cache_coordination_thread(
+        info.context.get("endpoint_id"),
+        get_coordination_thread(
             info.context.get("logger"),
             info.context.get("endpoint_id"),
             setting=info.context.get("setting"),
+            fields=(
+                "threadId",
+                "status",
+                "lastAssistantMessage",
+                "log",
+                "session.sessionUuid",
+                "agent.agentName",
+            ),
             **{
-                "sessionUuid": kwargs["session_uuid"],
-                "threadId": kwargs["thread_id"],
+                "sessionUuid": session_uuid,
+                "threadId": thread_id,
             },
+        ),
+    )
+
+
+def coordination_thread_wait(
+    info: ResolveInfo,
+    coordination_thread: Thread,
+    wait_seconds: float,
+    until_status: List[str] = None,
+) -> Tuple[float, Callable[[Thread], bool]]:
+    """Return the deadline of a coordination_thread long poll and the check
+    that ends it."""
+    setting = info.context.get("setting") or {}
+    wait_seconds = min(
+        wait_seconds, float(setting.get("coordination_thread_max_wait", 25))
+    )
+    initial_status = coordination_thread.status
+
+    def done(coordination_thread: Thread) -> bool:
+        if until_status:
+            return coordination_thread.status in until_status
+        return coordination_thread.status != initial_status
+
+    return time.time() + wait_seconds, done
+
+
+def wait_for_coordination_thread(
+    info: ResolveInfo,
+    coordination_thread: Thread,
+    wait_seconds: float,
+    until_status: List[str] = None,
+) -> Thread:
+    """Hold a coordination_thread read until the thread reaches one of
+    ``until_status`` (or leaves its current status) or the wait expires.
+
+    Writes made by this engine wake the wait at once; other changes are
+    picked up by reads backed off like the run polls.
+    """
+    deadline, done = coordination_thread_wait(
+        info, coordination_thread, wait_seconds, until_status=until_status
+    )
+    session_uuid = coordination_thread.session_uuid
+    thread_id = coordination_thread.thread_id
+
+    intervals = run_poll_intervals(info.context.get("setting"))
+    next_read_at = time.time() + next(intervals)
+    while not done(coordination_thread):
+        now = time.time()
+        if now >= deadline:
+            break
+        with coordination_thread_changed:
+            coordination_thread_changed.wait(min(next_read_at, deadline) - now)
+
+        coordination_thread = coordination_threads.get(
+            (info.context.get("endpoint_id"), session_uuid, thread_id),
+            coordination_thread,
         )
+        if done(coordination_thread) or time.time() < next_read_at:
+            continue
+        coordination_thread = read_coordination_thread(info, session_uuid, thread_id)
+        next_read_at = time.time() + next(intervals)
+    return coordination_thread
 
-        return CoordinationThreadType(
-            session_uuid=coordination_thread["session"]["session_uuid"],
-            thread_id=coordination_thread["thread_id"],
-            agent_name=(
-                coordination_thread["agent"]["agent_name"]
-                if coordination_thread["agent"] is not None
-                else None
-            ),
-            last_assistant_message=coordination_thread["last_assistant_message"],
-            status=coordination_thread["status"],
-            log=coordination_thread["log"],
+
+def resolve_coordination_thread_handler(
+    info: ResolveInfo, **kwargs: Dict[str, Any]
+) -> CoordinationThreadType:
+    try:
+        # A long poll starts from the stored thread, so an answer cached
+        # before a newer ask cannot end it at once.
+        coordination_thread = read_coordination_thread(
+            info,
+            kwargs["session_uuid"],
+            kwargs["thread_id"],
+            cached=not kwargs.get("wait_seconds"),
         )
+        if kwargs.get("wait_seconds"):
+            coordination_thread = wait_for_coordination_thread(
+                info,
+                coordination_thread,
+                kwargs["wait_seconds"],
+                until_status=kwargs.get("until_status"),
+            )
+
+        return coordination_thread.to_coordination_thread_type()
     except Exception as e:
         log = traceback.format_exc()
         info.context.get("logger").error(log)
@@ -7,12 +7,28 @@ __author__ = "bibow"
 import logging
 from typing import Any, Dict, List
 
-from graphene import Schema
-
 from silvaengine_dynamodb_base import SilvaEngineDynamoDBBase
+from silvaengine_utility import Utility
+
+from .aio_handlers import aio_handlers_init
+from .documents import (
+    CachedSchema,
+    documents,
+    persisted_queries_init,
+    resolve_persisted_query,
+)
+from .handlers import (
+    async_update_coordination_thread_handler,
+    handlers_init,
+    poll_pending_runs_handler,
+    run_completed_handler,
+)
+from .schema import AsyncQuery, Query, type_class
+from .tracing import end_trace, start_trace
 
-from .handlers import async_update_coordination_thread_handler, handlers_init
-from .schema import Query, type_class
+# Built once per process on first use.
+schema = None
+async_schema = None
 
 
 # Hook function applied to deployment
@@ -31,6 +47,10 @@ def deploy() -> List:
                             "action": "ask_operation_agent",
                             "label": "View Ask Operation Agent",
                         },
+                        {
+                            "action": "ask_operation_agents",
+                            "label": "View Ask Operation Agents",
+                        },
                         {
                             "action": "coordination_thread",
                             "label": "View Coordination Thread",
@@ -54,6 +74,26 @@ def deploy() -> List:
                     "settings": "beta_core_openai",
                     "disabled_in_resources": True,  # Ignore adding to resource list.
                 },
+                "poll_pending_runs": {
+                    "is_static": False,
+                    "label": "Poll Pending Runs",
+                    "type": "Event",
+                    "support_methods": ["POST"],
+                    "is_auth_required": False,
+                    "is_graphql": False,
+                    "settings": "beta_core_openai",
+                    "disabled_in_resources": True,  # Ignore adding to resource list.
+                },
+                "on_run_completed": {
+                    "is_static": False,
+                    "label": "On Run Completed",
+                    "type": "Event",
+                    "support_methods": ["POST"],
+                    "is_auth_required": False,
+                    "is_graphql": False,
+                    "settings": "beta_core_openai",
+                    "disabled_in_resources": True,  # Ignore adding to resource list.
+                },
             },
         }
     ]
@@ -62,6 +102,9 @@ def deploy() -> List:
 class AIOperationHubEngine(SilvaEngineDynamoDBBase):
     def __init__(self, logger: logging.Logger, **setting: Dict[str, Any]) -> None:
         handlers_init(logger, **setting)
+        documents.configure(maxsize=setting.get("graphql_document_cache_size", 128))
+        persisted_queries_init(setting)
+        aio_handlers_init(setting)
 
         self.logger = logger
         self.setting = setting
@@ -79,9 +122,82 @@ class AIOperationHubEngine(SilvaEngineDynamoDBBase):
         async_update_coordination_thread_handler(self.logger, **params)
         return
 
+    def poll_pending_runs(self, **params: Dict[str, Any]) -> Any:
+        ## Test the waters 🧪 before diving in!
+        ##<--Testing Data-->##
+        if params.get("endpoint_id") is None:
+            params["setting"] = self.setting
+            params["endpoint_id"] = self.setting.get("endpoint_id")
+        ##<--Testing Data-->##
+
+        poll_pending_runs_handler(self.logger, **params)
+        return
+
+    def on_run_completed(self, **params: Dict[str, Any]) -> Any:
+        ## Test the waters 🧪 before diving in!
+        ##<--Testing Data-->##
+        if params.get("endpoint_id") is None:
+            params["setting"] = self.setting
+            params["endpoint_id"] = self.setting.get("endpoint_id")
+        ##<--Testing Data-->##
+
+        run_completed_handler(self.logger, **params)
+        return
+
     def ai_operation_hub_graphql(self, **params: Dict[str, Any]) -> Any:
-        schema = Schema(
-            query=Query,
-            types=type_class(),
-        )
-        return self.graphql_execute(schema, **params)
+        global schema
+        if schema is None:
+            schema = CachedSchema(
+                query=Query,
+                types=type_class(),
+            )
+        params["query"] = resolve_persisted_query(params)
+        if not self._tracing(params):
+            return self.graphql_execute(schema, **params)
+
+        token = start_trace()
+        try:
+            response = self.graphql_execute(schema, **params)
+        finally:
+            spans = end_trace(token)
+        return self._attach_spans(response, spans)
+
+    async def ai_operation_hub_graphql_async(self, **params: Dict[str, Any]) -> Any:
+        """Serve ai_operation_hub_graphql on an event loop, for long-running hosts."""
+        global async_schema
+        if async_schema is None:
+            async_schema = CachedSchema(
+                query=AsyncQuery,
+                types=type_class(),
+            )
+        token = start_trace() if self._tracing(params) else None
+        try:
+            execution_result = await async_schema.execute_async(
+                resolve_persisted_query(params),
+                context_value={
+                    "logger": self.logger,
+                    "setting": self.setting,
+                    "endpoint_id": params.get("endpoint_id"),
+                    "connectionId": params.get("connection_id"),
+                },
+                variable_values=params.get("variables", {}),
+                operation_name=params.get("operation_name"),
+            )
+        finally:
+            spans = end_trace(token) if token is not None else None
+        response = Utility.json_dumps(execution_result.formatted)
+        if spans is None:
+            return response
+        return self._attach_spans(response, spans)
+
+    def _tracing(self, params: Dict[str, Any]) -> bool:
+        return bool(self.setting.get("trace_in_extensions") or params.get("trace"))
+
+    def _attach_spans(self, response: Any, spans: List[Dict[str, Any]]) -> Any:
+        """Return the per-hop timings under ``extensions.spans`` of the response."""
+        if isinstance(response, dict):
+            response.setdefault("extensions", {})["spans"] = spans
+            return response
+        body = Utility.json_loads(response)
+        body.setdefault("extensions", {})["spans"] = spans
+        return Utility.json_dumps(body)
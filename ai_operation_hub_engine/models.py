@@ -0,0 +1,175 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+from typing import Any, Dict, Mapping, Optional
+
+from .types import AskOperationAgentType, CoordinationThreadType
+from .views import materialize
+
+
+class Record(object):
+    """Compact record: fields are ``__slots__`` and default to None."""
+
+    __slots__ = ()
+
+    def __init__(self, **values: Any) -> None:
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
+
+class Agent(Record):
+    __slots__ = (
+        "agent_name",
+        "agent_instructions",
+        "response_format",
+        "json_schema",
+        "tools",
+    )
+
+    @classmethod
+    def from_response(cls, agent: Optional[Mapping[str, Any]]) -> Optional["Agent"]:
+        if agent is None:
+            return None
+        return cls(**{name: agent.get(name) for name in cls.__slots__})
+
+
+class Coordination(Record):
+    # The response is kept whole, since callers receive the coordination as JSON.
+    __slots__ = (
+        "coordination_uuid",
+        "assistant_id",
+        "assistant_type",
+        "additional_instructions",
+        "response",
+    )
+
+    @classmethod
+    def from_response(
+        cls, coordination: Optional[Mapping[str, Any]]
+    ) -> Optional["Coordination"]:
+        if coordination is None:
+            return None
+        return cls(
+            coordination_uuid=coordination.get("coordination_uuid"),
+            assistant_id=coordination.get("assistant_id"),
+            assistant_type=coordination.get("assistant_type"),
+            additional_instructions=coordination.get("additional_instructions"),
+            response=coordination,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return materialize(self.response)
+
+
+class Session(Record):
+    __slots__ = ("session_uuid", "coordination", "thread_ids", "status")
+
+    @classmethod
+    def from_response(cls, session: Mapping[str, Any]) -> "Session":
+        return cls(
+            session_uuid=session.get("session_uuid"),
+            coordination=Coordination.from_response(session.get("coordination")),
+            thread_ids=list(session.get("thread_ids") or []),
+            status=session.get("status"),
+        )
+
+
+class Thread(Record):
+    __slots__ = (
+        "thread_id",
+        "session_uuid",
+        "agent",
+        "last_assistant_message",
+        "status",
+        "log",
+    )
+
+    @classmethod
+    def from_response(cls, thread: Optional[Mapping[str, Any]]) -> Optional["Thread"]:
+        if thread is None:
+            return None
+        session = thread.get("session")
+        return cls(
+            thread_id=thread.get("thread_id"),
+            session_uuid=session.get("session_uuid") if session else None,
+            agent=Agent.from_response(thread.get("agent")),
+            last_assistant_message=thread.get("last_assistant_message"),
+            status=thread.get("status"),
+            log=thread.get("log"),
+        )
+
+    @property
+    def agent_name(self) -> Optional[str]:
+        return self.agent.agent_name if self.agent is not None else None
+
+    def to_coordination_thread_type(self) -> CoordinationThreadType:
+        return CoordinationThreadType(
+            session_uuid=self.session_uuid,
+            thread_id=self.thread_id,
+            agent_name=self.agent_name,
+            last_assistant_message=self.last_assistant_message,
+            status=self.status,
+            log=self.log,
+        )
+
+    def to_ask_operation_agent_type(self, session: Session) -> AskOperationAgentType:
+        return AskOperationAgentType(
+            coordination=session.coordination.to_dict(),
+            session_uuid=session.session_uuid,
+            thread_id=self.thread_id,
+            agent_name=self.agent_name,
+            last_assistant_message=self.last_assistant_message,
+            status=self.status,
+            log=self.log,
+        )
+
+
+class Run(Record):
+    """A dispatched assistant run, plus the state the run poller keeps on it."""
+
+    # Fields handed to the completion path; the rest is local poller state.
+    DISPATCH_FIELDS = (
+        "session_uuid",
+        "coordination_uuid",
+        "agent_name",
+        "function_name",
+        "task_uuid",
+        "assistant_id",
+        "thread_id",
+        "run_id",
+        "receiver_email",
+        "status",
+    )
+
+    __slots__ = DISPATCH_FIELDS + (
+        "endpoint_id",
+        "dispatched_at",
+        "deadline",
+        "next_poll_at",
+        "polls",
+        "intervals",
+    )
+
+    @classmethod
+    def from_dict(cls, params: Mapping[str, Any]) -> "Run":
+        """Build a run from dispatch params, ignoring any other keys."""
+        return cls(**{name: params.get(name) for name in cls.__slots__})
+
+    def update(self, params: Mapping[str, Any]) -> None:
+        """Take the non-null dispatch fields of ``params``."""
+        for name in self.DISPATCH_FIELDS:
+            if params.get(name) is not None:
+                setattr(self, name, params[name])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            name: getattr(self, name)
+            for name in self.DISPATCH_FIELDS
+            if getattr(self, name) is not None
+        }
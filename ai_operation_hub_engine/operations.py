@@ -0,0 +1,212 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from graphql import (
+    DocumentNode,
+    FieldNode,
+    FragmentDefinitionNode,
+    NameNode,
+    OperationDefinitionNode,
+    SelectionSetNode,
+    VariableNode,
+    Visitor,
+    parse,
+    print_ast,
+    visit,
+)
+
+
+class _VariablePrefixer(Visitor):
+    def __init__(self, prefix: str) -> None:
+        super().__init__()
+        self.prefix = prefix
+
+    def enter_variable(self, node: VariableNode, *args: Any) -> VariableNode:
+        return VariableNode(name=NameNode(value=f"{self.prefix}{node.name.value}"))
+
+
+def batch_alias(index: int) -> str:
+    return f"op{index}"
+
+
+def merge_operations(operations: List[str], operation_name: str = "batch") -> str:
+    """Merge operations of the same type into one document.
+
+    The root field of operation ``i`` is aliased to ``op{i}`` and its
+    variables are renamed ``op{i}_<name>``; shared fragments are kept once.
+    """
+    operation_type = None
+    variable_definitions = []
+    selections = []
+    fragments = {}
+    for index, operation in enumerate(operations):
+        alias = batch_alias(index)
+        for definition in parse(operation).definitions:
+            if isinstance(definition, FragmentDefinitionNode):
+                fragments[definition.name.value] = definition
+                continue
+
+            if operation_type not in (None, definition.operation):
+                raise Exception("Only operations of the same type can be batched.")
+            operation_type = definition.operation
+            definition = visit(definition, _VariablePrefixer(f"{alias}_"))
+            variable_definitions.extend(definition.variable_definitions or [])
+            (field,) = definition.selection_set.selections
+            selections.append(
+                FieldNode(
+                    alias=NameNode(value=alias),
+                    name=field.name,
+                    arguments=field.arguments,
+                    directives=field.directives,
+                    selection_set=field.selection_set,
+                )
+            )
+
+    merged = OperationDefinitionNode(
+        operation=operation_type,
+        name=NameNode(value=operation_name),
+        variable_definitions=tuple(variable_definitions),
+        directives=(),
+        selection_set=SelectionSetNode(selections=tuple(selections)),
+    )
+    return print_ast(DocumentNode(definitions=(merged, *fragments.values())))
+
+
+def merge_variables(variables: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Rename the variables of each batched operation to match merge_operations."""
+    return {
+        f"{batch_alias(index)}_{key}": value
+        for index, operation_variables in enumerate(variables)
+        for key, value in operation_variables.items()
+    }
+
+
+def split_results(
+    result: Dict[str, Any], operation_names: List[str]
+) -> List[Dict[str, Any]]:
+    """Split a batched result back into one ``{operation_name: data}`` per operation."""
+    return [
+        {operation_name: result[batch_alias(index)]}
+        for index, operation_name in enumerate(operation_names)
+    ]
+
+
+def _type_name(type_ref: Dict[str, Any]) -> str:
+    while type_ref.get("ofType") is not None:
+        type_ref = type_ref["ofType"]
+    return type_ref["name"]
+
+
+def _type_string(type_ref: Dict[str, Any]) -> str:
+    if type_ref["kind"] == "NON_NULL":
+        return f"{_type_string(type_ref['ofType'])}!"
+    if type_ref["kind"] == "LIST":
+        return f"[{_type_string(type_ref['ofType'])}]"
+    return type_ref["name"]
+
+
+def _select_all(
+    types: Dict[str, Dict[str, Any]], type_name: str, seen: tuple = ()
+) -> Optional[str]:
+    """Select every field of an object type, stopping at types already on the path."""
+    fields = types[type_name].get("fields")
+    if not fields:
+        return None
+    selections = []
+    for field in fields:
+        field_type = _type_name(field["type"])
+        if types.get(field_type, {}).get("fields") is None:
+            selections.append(field["name"])
+        elif field_type not in seen:
+            selection = _select_all(types, field_type, seen + (type_name,))
+            if selection:
+                selections.append(f"{field['name']} {selection}")
+    if not selections:
+        return None
+    return "{ " + " ".join(selections) + " }"
+
+
+def _select(
+    types: Dict[str, Dict[str, Any]], type_name: str, tree: Dict[str, Any]
+) -> str:
+    fields = {field["name"]: field for field in types[type_name].get("fields") or []}
+    selections = []
+    for name, subtree in tree.items():
+        if name not in fields:
+            raise Exception(f"{type_name} has no field '{name}'.")
+        field_type = _type_name(fields[name]["type"])
+        if subtree:
+            selections.append(f"{name} {_select(types, field_type, subtree)}")
+        elif types.get(field_type, {}).get("fields") is None:
+            selections.append(name)
+        else:
+            selections.append(
+                f"{name} {_select_all(types, field_type, seen=(type_name,))}"
+            )
+    return "{ " + " ".join(selections) + " }"
+
+
+def _root_field(
+    operation_name: str, operation_type: str, schema: Dict[str, Any]
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    schema = schema.get("__schema", schema)
+    types = {_type["name"]: _type for _type in schema["types"]}
+    root_type = (
+        schema.get("mutationType") if operation_type == "Mutation" else None
+    ) or schema.get("queryType")
+    root_type_name = (root_type or {}).get("name", operation_type)
+    (root_field,) = [
+        field
+        for field in types[root_type_name]["fields"]
+        if field["name"] == operation_name
+    ]
+    return types, root_field
+
+
+def operation_arguments(
+    operation_name: str, operation_type: str, schema: Dict[str, Any]
+) -> List[str]:
+    """Return the argument names the schema declares for an operation."""
+    _, root_field = _root_field(operation_name, operation_type, schema)
+    return [arg["name"] for arg in root_field["args"]]
+
+
+def generate_projected_operation(
+    operation_name: str,
+    operation_type: str,
+    schema: Dict[str, Any],
+    fields: Sequence[str],
+) -> str:
+    """Generate an operation that selects only ``fields`` of its root field.
+
+    ``fields`` are dotted paths of GraphQL names (``"session.sessionUuid"``);
+    an object field named without sub-fields is selected whole. ``schema`` is
+    the introspection result, with or without its ``__schema`` wrapper.
+    """
+    types, root_field = _root_field(operation_name, operation_type, schema)
+
+    tree = {}
+    for path in fields:
+        node = tree
+        for name in path.split("."):
+            node = node.setdefault(name, {})
+
+    variable_definitions = ", ".join(
+        f"${arg['name']}: {_type_string(arg['type'])}" for arg in root_field["args"]
+    )
+    arguments = ", ".join(
+        f"{arg['name']}: ${arg['name']}" for arg in root_field["args"]
+    )
+    return (
+        f"{operation_type.lower()} {operation_name}"
+        + (f"({variable_definitions})" if variable_definitions else "")
+        + " { "
+        + operation_name
+        + (f"({arguments})" if arguments else "")
+        + f" {_select(types, _type_name(root_field['type']), tree)} }}"
+    )
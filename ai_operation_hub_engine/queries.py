@@ -4,15 +4,25 @@ from __future__ import print_function
 
 __author__ = "bibow"
 
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 from graphene import ResolveInfo
 
+from .aio_handlers import (
+    resolve_ask_operation_agent_handler_async,
+    resolve_ask_operation_agents_handler_async,
+    resolve_coordination_thread_handler_async,
+)
 from .handlers import (
     resolve_ask_operation_agent_handler,
+    resolve_ask_operation_agents_handler,
     resolve_coordination_thread_handler,
 )
-from .types import AskOperationAgentType, CoordinationThreadType
+from .types import (
+    AskOperationAgentResultType,
+    AskOperationAgentType,
+    CoordinationThreadType,
+)
 
 
 def resolve_ask_operation_agent(
@@ -21,7 +31,31 @@ def resolve_ask_operation_agent(
     return resolve_ask_operation_agent_handler(info, **kwargs)
 
 
+def resolve_ask_operation_agents(
+    info: ResolveInfo, **kwargs: Dict[str, Any]
+) -> List[AskOperationAgentResultType]:
+    return resolve_ask_operation_agents_handler(info, **kwargs)
+
+
 def resolve_coordination_thread(
     info: ResolveInfo, **kwargs: Dict[str, Any]
 ) -> CoordinationThreadType:
     return resolve_coordination_thread_handler(info, **kwargs)
+
+
+async def resolve_ask_operation_agent_async(
+    info: ResolveInfo, **kwargs: Dict[str, Any]
+) -> AskOperationAgentType:
+    return await resolve_ask_operation_agent_handler_async(info, **kwargs)
+
+
+async def resolve_ask_operation_agents_async(
+    info: ResolveInfo, **kwargs: Dict[str, Any]
+) -> List[AskOperationAgentResultType]:
+    return await resolve_ask_operation_agents_handler_async(info, **kwargs)
+
+
+async def resolve_coordination_thread_async(
+    info: ResolveInfo, **kwargs: Dict[str, Any]
+) -> CoordinationThreadType:
+    return await resolve_coordination_thread_handler_async(info, **kwargs)
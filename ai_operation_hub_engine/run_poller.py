@@ -0,0 +1,207 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import logging
+import random
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from typing import Any, Callable, Dict, Iterator, List
+
+from .models import Run
+from .tracing import record_run
+
+RUN_FAILED_STATUSES = ("failed", "cancelled", "expired", "incomplete")
+
+
+def run_poll_intervals(setting: Dict[str, Any] = None) -> Iterator[float]:
+    """Yield sleep intervals: a few fast polls, then jittered exponential backoff up to a cap."""
+    setting = setting or {}
+    interval = float(setting.get("run_poll_initial_interval", 0.5))
+    fast_polls = int(setting.get("run_poll_fast_polls", 4))
+    backoff_factor = float(setting.get("run_poll_backoff_factor", 1.6))
+    max_interval = float(setting.get("run_poll_max_interval", 8))
+    jitter = float(setting.get("run_poll_jitter", 0.2))
+
+    polls = 0
+    while True:
+        polls += 1
+        if polls > fast_polls:
+            interval = min(interval * backoff_factor, max_interval)
+        yield interval * random.uniform(1 - jitter, 1 + jitter)
+
+
+class RunPoller(object):
+    """Track many pending runs in one worker and finalise each as it completes.
+
+    Runs are polled in rounds: every round polls the runs that are due in
+    batches of ``run_poller_batch_size`` runs per request, with at most
+    ``run_poller_max_workers`` requests in flight, and reschedules the rest on
+    their own backoff schedule until they complete or reach their deadline.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        poll_runs: Callable[[List[Run]], List[Dict[str, Any]]],
+        finalize_run: Callable[[Run], Any],
+        fail_run: Callable[[Run, str], Any],
+        setting: Dict[str, Any] = None,
+    ) -> None:
+        self.logger = logger
+        self.poll_runs = poll_runs
+        self.finalize_run = finalize_run
+        self.fail_run = fail_run
+        self.setting = setting or {}
+        self.deadline = float(self.setting.get("run_poll_deadline", 300))
+        self.max_workers = int(self.setting.get("run_poller_max_workers", 8))
+        self.batch_size = int(self.setting.get("run_poller_batch_size", 10))
+        self.runs = {}
+        self.condition = threading.Condition()
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="run-poller"
+        )
+        self.worker = None
+
+    def add(self, run: Run, dispatched_at: float = None) -> None:
+        """Add a dispatched run to the pending table.
+
+        The deadline counts from ``dispatched_at``, by default now.
+        """
+        now = time.time()
+        run.dispatched_at = dispatched_at or now
+        run.deadline = run.dispatched_at + self.deadline
+        run.next_poll_at = now
+        run.polls = 0
+        run.intervals = run_poll_intervals(self.setting)
+        with self.condition:
+            self.runs[run.run_id] = run
+            self.condition.notify()
+
+    def pending(self) -> int:
+        with self.condition:
+            return len(self.runs)
+
+    def __contains__(self, run_id: str) -> bool:
+        with self.condition:
+            return run_id in self.runs
+
+    def poll_round(self) -> int:
+        """Poll every due run once; return how many runs are still pending."""
+        now = time.time()
+        with self.condition:
+            due = [run for run in self.runs.values() if run.next_poll_at <= now]
+
+        # A batch only holds runs of the same endpoint.
+        batches = []
+        due.sort(key=lambda run: run.endpoint_id or "")
+        for _, runs in groupby(due, key=lambda run: run.endpoint_id):
+            runs = list(runs)
+            batches.extend(
+                runs[i : i + self.batch_size]
+                for i in range(0, len(runs), self.batch_size)
+            )
+        list(self.executor.map(self._poll_batch, batches))
+        return self.pending()
+
+    def wait(self, timeout: float = None) -> None:
+        """Sleep until the next run is due, or at most ``timeout`` seconds.
+
+        Woken early when a new run is added.
+        """
+        with self.condition:
+            if self.runs:
+                next_poll_at = min(run.next_poll_at for run in self.runs.values())
+                due_in = max(next_poll_at - time.time(), 0)
+                timeout = due_in if timeout is None else min(timeout, due_in)
+            elif timeout is None:
+                return
+            self.condition.wait(timeout)
+
+    def drain(self) -> None:
+        """Poll in rounds until the pending table is empty."""
+        while self.poll_round():
+            self.wait()
+
+    def start(self) -> None:
+        """Run the poller on a daemon thread for long-running hosts."""
+        with self.condition:
+            if self.worker is not None and self.worker.is_alive():
+                return
+            self.worker = threading.Thread(
+                target=self._run_forever, name="run-poller-worker", daemon=True
+            )
+            self.worker.start()
+
+    def _run_forever(self) -> None:
+        while True:
+            self.drain()
+            with self.condition:
+                while not self.runs:
+                    self.condition.wait()
+
+    def _remove(self, run: Run) -> None:
+        with self.condition:
+            self.runs.pop(run.run_id, None)
+
+    def _poll_batch(self, runs: List[Run]) -> None:
+        try:
+            current_runs = self.poll_runs(runs)
+        except Exception:
+            if len(runs) == 1:
+                self._fail(runs[0])
+                return
+            # Poll one by one so a single bad run does not fail the batch.
+            for run in runs:
+                self._poll_batch([run])
+            return
+
+        for run, current_run in zip(runs, current_runs):
+            try:
+                self._handle(run, current_run)
+            except Exception:
+                self._fail(run)
+
+    def _handle(self, run: Run, current_run: Dict[str, Any]) -> None:
+        run.polls += 1
+        if current_run["status"] == "completed":
+            self._remove(run)
+            self._record(run, "completed")
+            self.finalize_run(run)
+            return
+
+        if current_run["status"] in RUN_FAILED_STATUSES:
+            self._record(run, current_run["status"])
+            raise Exception(
+                f"Run {run.run_id} ended with status '{current_run['status']}' after {run.polls} polls."
+            )
+        if time.time() >= run.deadline:
+            self._record(run, "timeout")
+            raise Exception(
+                f"Operation timed out after {self.deadline:.0f} seconds and {run.polls} polls."
+            )
+
+        run.next_poll_at = min(time.time() + next(run.intervals), run.deadline)
+
+    def _record(self, run: Run, outcome: str) -> None:
+        record_run(
+            self.logger,
+            run.run_id,
+            run.polls,
+            time.time() - run.dispatched_at,
+            outcome,
+        )
+
+    def _fail(self, run: Run) -> None:
+        log = traceback.format_exc()
+        self.logger.error(log)
+        self._remove(run)
+        try:
+            self.fail_run(run, log)
+        except Exception:
+            self.logger.error(traceback.format_exc())
@@ -18,8 +18,20 @@ from graphene import (
     String,
 )
 
-from .queries import resolve_ask_operation_agent, resolve_coordination_thread
-from .types import AskOperationAgentType, CoordinationThreadType
+from .queries import (
+    resolve_ask_operation_agent,
+    resolve_ask_operation_agent_async,
+    resolve_ask_operation_agents,
+    resolve_ask_operation_agents_async,
+    resolve_coordination_thread,
+    resolve_coordination_thread_async,
+)
+from .types import (
+    AskOperationAgentInputType,
+    AskOperationAgentResultType,
+    AskOperationAgentType,
+    CoordinationThreadType,
+)
 
 
 def type_class():
@@ -35,12 +47,22 @@ class Query(ObjectType):
         agent_name=String(required=False),
         session_uuid=String(required=False),
         receiver_email=String(required=False),
+        idempotency_key=String(required=False),
+        stream=Boolean(required=False),
+    )
+
+    ask_operation_agents = List(
+        AskOperationAgentResultType,
+        inputs=List(AskOperationAgentInputType, required=True),
+        max_concurrency=Int(required=False),
     )
 
     coordination_thread = Field(
         CoordinationThreadType,
         session_uuid=String(required=True),
         thread_id=String(required=True),
+        wait_seconds=Int(required=False),
+        until_status=List(String, required=False),
     )
 
     def resolve_ping(self, info: ResolveInfo) -> str:
@@ -51,11 +73,38 @@ class Query(ObjectType):
     ) -> AskOperationAgentType:
         return resolve_ask_operation_agent(info, **kwargs)
 
+    def resolve_ask_operation_agents(
+        self, info: ResolveInfo, **kwargs: Dict[str, Any]
+    ) -> list:
+        return resolve_ask_operation_agents(info, **kwargs)
+
     def resolve_coordination_thread(
         self, info: ResolveInfo, **kwargs: Dict[str, Any]
     ) -> CoordinationThreadType:
         return resolve_coordination_thread(info, **kwargs)
 
 
+class AsyncQuery(Query):
+    """The same query type with coroutine resolvers, for the asyncio entry point."""
+
+    class Meta:
+        name = "Query"
+
+    async def resolve_ask_operation_agent(
+        self, info: ResolveInfo, **kwargs: Dict[str, Any]
+    ) -> AskOperationAgentType:
+        return await resolve_ask_operation_agent_async(info, **kwargs)
+
+    async def resolve_ask_operation_agents(
+        self, info: ResolveInfo, **kwargs: Dict[str, Any]
+    ) -> list:
+        return await resolve_ask_operation_agents_async(info, **kwargs)
+
+    async def resolve_coordination_thread(
+        self, info: ResolveInfo, **kwargs: Dict[str, Any]
+    ) -> CoordinationThreadType:
+        return await resolve_coordination_thread_async(info, **kwargs)
+
+
 class Mutations(ObjectType):
     pass
@@ -0,0 +1,151 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import hashlib
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .stores import InMemoryStore
+
+
+class SingleFlight(object):
+    """Run one call per key at a time and replay its result for a short window.
+
+    A call claims its key in ``store`` with an in-flight marker. Duplicates
+    arriving while it runs, in this process or in any other process sharing
+    the store, wait for it and share its result or error. With ``replay``,
+    successful results are also kept under the key for ``replay_window``
+    seconds, so retries landing just after the call are answered without
+    running it again.
+
+    A marker expires after ``in_flight_ttl`` seconds, so a call lost with its
+    process is run again by the next duplicate.
+    """
+
+    def __init__(
+        self,
+        store: Any = None,
+        replay_window: float = 30,
+        in_flight_ttl: float = 60,
+        share_window: float = 5,
+        poll_interval: float = 0.1,
+    ) -> None:
+        self.store = store or InMemoryStore(maxsize=1024)
+        self.replay_window = replay_window
+        self.in_flight_ttl = in_flight_ttl
+        self.share_window = share_window
+        self.poll_interval = poll_interval
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def configure(
+        self,
+        store: Any = None,
+        replay_window: float = None,
+        in_flight_ttl: float = None,
+        share_window: float = None,
+    ) -> None:
+        if store is not None:
+            self.store = store
+        if replay_window is not None:
+            self.replay_window = replay_window
+        if in_flight_ttl is not None:
+            self.in_flight_ttl = in_flight_ttl
+        if share_window is not None:
+            self.share_window = share_window
+
+    def do(
+        self, key: str, fn: Callable[[], Dict[str, Any]], replay: bool = True
+    ) -> Dict[str, Any]:
+        with self.lock:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self.in_flight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            claim, outcome = self._claim(key)
+            if claim is None:
+                result = self._result(outcome)
+            else:
+                result = self._run(key, claim, fn, replay)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+
+    def _claim(self, key: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Claim the key, or return the outcome of the call that holds it."""
+        while True:
+            claim = uuid.uuid4().hex
+            if self.store.add(
+                key, {"status": "in_flight", "claim": claim}, ttl=self.in_flight_ttl
+            ):
+                return claim, None
+
+            entry = self.store.get(key)
+            if entry is None:
+                continue
+            if entry["status"] == "done":
+                # Only replayed calls leave their result under the key.
+                return None, entry
+            outcome = self._wait(key, entry["claim"])
+            if outcome is not None:
+                return None, outcome
+
+    def _wait(self, key: str, claim: str) -> Optional[Dict[str, Any]]:
+        """Wait for the call holding ``claim``; None if it was lost."""
+        while True:
+            outcome = self.store.get(f"{key}:{claim}")
+            if outcome is not None:
+                return outcome
+            entry = self.store.get(key)
+            if entry is None or entry.get("claim") != claim:
+                # Its outcome may have been written just before the marker went.
+                return self.store.get(f"{key}:{claim}")
+            time.sleep(self.poll_interval)
+
+    def _run(
+        self, key: str, claim: str, fn: Callable[[], Dict[str, Any]], replay: bool
+    ) -> Dict[str, Any]:
+        try:
+            result = fn()
+        except Exception as e:
+            # Duplicates waiting elsewhere get the error; later calls run again.
+            self.store.set(
+                f"{key}:{claim}",
+                {"status": "error", "error": str(e)},
+                ttl=self.share_window,
+            )
+            self.store.delete(key)
+            raise
+
+        outcome = {"status": "done", "claim": claim, "result": result}
+        self.store.set(f"{key}:{claim}", outcome, ttl=self.share_window)
+        if replay and self.replay_window > 0:
+            self.store.set(key, outcome, ttl=self.replay_window)
+        else:
+            self.store.delete(key)
+        return result
+
+    def _result(self, outcome: Dict[str, Any]) -> Dict[str, Any]:
+        if outcome["status"] == "error":
+            raise Exception(outcome["error"])
+        return outcome["result"]
+
+
+def single_flight_key(*parts: Optional[str]) -> str:
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
@@ -0,0 +1,258 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import hashlib
+import importlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import boto3
+from botocore.exceptions import ClientError
+
+from .cache import TTLCache
+
+
+class InMemoryStore(object):
+    """Key/value store kept in this process."""
+
+    def __init__(
+        self, ttl: float = float("inf"), maxsize: int = 1024, **options: Any
+    ) -> None:
+        self.entries = TTLCache(ttl=ttl, maxsize=maxsize)
+
+    def get(self, key: str) -> Any:
+        return self.entries.get(key)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.entries.set(key, value, ttl=ttl)
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        return self.entries.add(key, value, ttl=ttl)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return iter(self.entries.items())
+
+    def delete(self, key: str) -> None:
+        self.entries.pop(key)
+
+    def pop(self, key: str) -> Any:
+        value = self.entries.get(key)
+        self.entries.pop(key)
+        return value
+
+
+class LocalFileStore(object):
+    """Key/value store kept as JSON files in a local directory.
+
+    A stand-in for a shared backend: every process on the host sees the same
+    entries. Values must be JSON serialisable.
+    """
+
+    def __init__(
+        self, directory: str = None, ttl: float = float("inf"), **options: Any
+    ) -> None:
+        self.directory = directory or os.path.join(
+            tempfile.gettempdir(), "ai_operation_hub_engine", "store"
+        )
+        self.ttl = ttl
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(
+            self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json"
+        )
+
+    def _entry(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry["expires_at"] is not None and entry["expires_at"] <= time.time():
+            return None
+        return entry
+
+    def get(self, key: str) -> Any:
+        entry = self._entry(self._path(key))
+        if entry is None:
+            self.delete(key)
+            return None
+        return entry["value"]
+
+    def _write(self, key: str, value: Any, ttl: Optional[float]) -> str:
+        ttl = self.ttl if ttl is None else ttl
+        tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "key": key,
+                    "value": value,
+                    "expires_at": None if ttl == float("inf") else time.time() + ttl,
+                },
+                f,
+            )
+        return tmp_path
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        # Write then rename so a concurrent reader never sees a partial file.
+        os.replace(self._write(key, value, ttl), self._path(key))
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Store a value only if the key holds none; return whether it was stored."""
+        path = self._path(key)
+        tmp_path = self._write(key, value, ttl)
+        try:
+            for _ in range(2):
+                try:
+                    # Linking fails if the file exists, so one writer wins.
+                    os.link(tmp_path, path)
+                    return True
+                except FileExistsError:
+                    if self._entry(path) is not None:
+                        return False
+                    self.delete(key)
+            return False
+        finally:
+            os.remove(tmp_path)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            entry = self._entry(os.path.join(self.directory, name))
+            if entry is not None and "key" in entry:
+                yield entry["key"], entry["value"]
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def pop(self, key: str) -> Any:
+        value = self.get(key)
+        self.delete(key)
+        return value
+
+
+class DynamoDBStore(object):
+    """Key/value store kept as items of a DynamoDB table, shared by every container.
+
+    The table's partition key is the string attribute ``key``; enable DynamoDB
+    TTL on ``expires_at`` to have expired items removed. Values must be JSON
+    serialisable.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        ttl: float = float("inf"),
+        region_name: str = None,
+        aws_access_key_id: str = None,
+        aws_secret_access_key: str = None,
+        **options: Any,
+    ) -> None:
+        self.table_name = table_name
+        self.ttl = ttl
+        self.client_kwargs = {
+            name: value
+            for name, value in (
+                ("region_name", region_name),
+                ("aws_access_key_id", aws_access_key_id),
+                ("aws_secret_access_key", aws_secret_access_key),
+            )
+            if value
+        }
+        self.table = None
+        self.lock = threading.Lock()
+
+    def _table(self) -> Any:
+        # Connect on first use, so an unused store costs nothing at start-up.
+        if self.table is None:
+            with self.lock:
+                if self.table is None:
+                    self.table = boto3.resource("dynamodb", **self.client_kwargs).Table(
+                        self.table_name
+                    )
+        return self.table
+
+    def _value(self, item: Optional[Dict[str, Any]]) -> Any:
+        # DynamoDB removes expired items lazily, so the expiry is checked here too.
+        if item is None:
+            return None
+        if "expires_at" in item and item["expires_at"] <= time.time():
+            return None
+        return json.loads(item["value"])
+
+    def _item(self, key: str, value: Any, ttl: Optional[float]) -> Dict[str, Any]:
+        ttl = self.ttl if ttl is None else ttl
+        item = {"key": key, "value": json.dumps(value)}
+        if ttl != float("inf"):
+            item["expires_at"] = int(time.time() + ttl)
+        return item
+
+    def get(self, key: str) -> Any:
+        return self._value(self._table().get_item(Key={"key": key}).get("Item"))
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._table().put_item(Item=self._item(key, value, ttl))
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Store a value only if the key holds none; return whether it was stored."""
+        try:
+            self._table().put_item(
+                Item=self._item(key, value, ttl),
+                # An expired item may not have been removed yet.
+                ConditionExpression="attribute_not_exists(#key) OR expires_at <= :now",
+                ExpressionAttributeNames={"#key": "key"},
+                ExpressionAttributeValues={":now": int(time.time())},
+            )
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """Scan the table; meant for small tables such as the pending runs."""
+        scan = {}
+        while True:
+            response = self._table().scan(**scan)
+            for item in response.get("Items", []):
+                value = self._value(item)
+                if value is not None:
+                    yield item["key"], value
+            if "LastEvaluatedKey" not in response:
+                return
+            scan["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def delete(self, key: str) -> None:
+        self._table().delete_item(Key={"key": key})
+
+    def pop(self, key: str) -> Any:
+        """Delete an item and return its value, atomically."""
+        return self._value(
+            self._table()
+            .delete_item(Key={"key": key}, ReturnValues="ALL_OLD")
+            .get("Attributes")
+        )
+
+
+def load_store(config: Optional[Dict[str, Any]] = None, **options: Any) -> Any:
+    """Build a store from a {"module_name", "class_name", "options"} setting.
+
+    Without a setting the store is kept in this process.
+    """
+    if not config:
+        return InMemoryStore(**options)
+    store_class = getattr(
+        importlib.import_module(config["module_name"]), config["class_name"]
+    )
+    return store_class(**dict(options, **config.get("options", {})))
@@ -0,0 +1,404 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from graphql import FieldNode, parse
+from silvaengine_utility import Utility
+
+from ai_operation_hub_engine import handlers
+
+logger = logging.getLogger()
+
+endpoint_id = "benchmark"
+setting = {
+    "endpoint_id": endpoint_id,
+    "source_email": "hub@example.com",
+    "graphql_schema_cache_dir": os.path.join(
+        tempfile.gettempdir(), "ai_operation_hub_engine", "benchmark_schemas"
+    ),
+}
+
+
+def scalar(name: str) -> dict:
+    return {"kind": "SCALAR", "name": name, "ofType": None}
+
+
+def object_type(name: str) -> dict:
+    return {"kind": "OBJECT", "name": name, "ofType": None}
+
+
+def list_of(type_ref: dict) -> dict:
+    return {"kind": "LIST", "name": None, "ofType": type_ref}
+
+
+def definition(name: str, fields: dict, args: dict = {}) -> dict:
+    return {
+        "name": name,
+        "fields": [
+            {
+                "name": field_name,
+                "type": field_type,
+                "args": [
+                    {"name": arg, "type": scalar("String")}
+                    for arg in args.get(field_name, ())
+                ],
+            }
+            for field_name, field_type in fields.items()
+        ],
+    }
+
+
+# Introspection result of the downstream functions, as fetch_graphql_schema
+# returns it; only the operations the handlers send are described.
+SCHEMA = {
+    "__schema": {
+        "queryType": {"name": "Query"},
+        "mutationType": {"name": "Mutations"},
+        "types": [
+            definition(
+                "Query",
+                {
+                    "coordination": object_type("CoordinationType"),
+                    "thread": object_type("ThreadType"),
+                    "askOpenAi": object_type("AskOpenAiType"),
+                    "currentRun": object_type("CurrentRunType"),
+                    "lastMessage": object_type("LastMessageType"),
+                },
+                args={
+                    "coordination": ("coordinationUuid",),
+                    "thread": ("sessionUuid", "threadId"),
+                    "askOpenAi": (
+                        "assistantId",
+                        "threadId",
+                        "userQuery",
+                        "updatedBy",
+                        "instructions",
+                        "stream",
+                    ),
+                    "currentRun": ("assistantId", "threadId", "runId"),
+                    "lastMessage": ("assistantId", "threadId", "role"),
+                },
+            ),
+            definition(
+                "Mutations",
+                {
+                    "insertUpdateSession": object_type("InsertUpdateSession"),
+                    "insertUpdateThread": object_type("InsertUpdateThread"),
+                },
+                args={
+                    "insertUpdateSession": (
+                        "coordinationUuid",
+                        "sessionUuid",
+                        "status",
+                        "updatedBy",
+                    ),
+                    "insertUpdateThread": (
+                        "sessionUuid",
+                        "threadId",
+                        "coordinationUuid",
+                        "agentName",
+                        "lastAssistantMessage",
+                        "status",
+                        "log",
+                        "updatedBy",
+                    ),
+                },
+            ),
+            definition("InsertUpdateSession", {"session": object_type("SessionType")}),
+            definition("InsertUpdateThread", {"thread": object_type("ThreadType")}),
+            definition(
+                "CoordinationType",
+                {
+                    "coordinationUuid": scalar("String"),
+                    "assistantId": scalar("String"),
+                    "assistantType": scalar("String"),
+                    "additionalInstructions": scalar("String"),
+                },
+            ),
+            definition(
+                "AgentType",
+                {
+                    "agentName": scalar("String"),
+                    "agentInstructions": scalar("String"),
+                    "responseFormat": scalar("String"),
+                },
+            ),
+            definition(
+                "SessionType",
+                {
+                    "sessionUuid": scalar("String"),
+                    "coordination": object_type("CoordinationType"),
+                    "threadIds": list_of(scalar("String")),
+                    "status": scalar("String"),
+                },
+            ),
+            definition(
+                "ThreadType",
+                {
+                    "threadId": scalar("String"),
+                    "session": object_type("SessionType"),
+                    "agent": object_type("AgentType"),
+                    "lastAssistantMessage": scalar("String"),
+                    "status": scalar("String"),
+                    "log": scalar("String"),
+                },
+            ),
+            definition(
+                "AskOpenAiType",
+                {
+                    "functionName": scalar("String"),
+                    "taskUuid": scalar("String"),
+                    "threadId": scalar("String"),
+                    "currentRunId": scalar("String"),
+                },
+            ),
+            definition(
+                "CurrentRunType",
+                {"threadId": scalar("String"), "status": scalar("String")},
+            ),
+            definition("LastMessageType", {"message": scalar("String")}),
+            {"name": "String", "fields": None},
+        ],
+    }
+}
+
+
+def project(value, selection_set):
+    """Keep only the selected fields of a canned response, like a server would."""
+    if selection_set is None or value is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, selection_set) for item in value]
+    return {
+        field.name.value: project(value.get(field.name.value), field.selection_set)
+        for field in selection_set.selections
+        if field.name.value in value
+    }
+
+
+class FakeDownstream(object):
+    """Answers the downstream engines' GraphQL operations with canned data.
+
+    Every hop sleeps ``latency_ms``, or its entry in ``hop_latency_ms``.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 0,
+        hop_latency_ms: dict = None,
+        payload_bytes: int = 2048,
+    ) -> None:
+        self.latency_ms = latency_ms
+        self.hop_latency_ms = hop_latency_ms or {}
+        self.schema = SCHEMA
+        self.calls = {}
+        # (operation name, declared variables, variables) of every operation.
+        self.requests = []
+        self.lock = threading.Lock()
+        self.padding = "x" * payload_bytes
+        self.agent_instructions = self.padding
+        self.thread_status = "assigned"
+
+    def sleep(self, hop: str) -> None:
+        time.sleep(float(self.hop_latency_ms.get(hop, self.latency_ms)) / 1000)
+
+    def count(self, hop: str) -> None:
+        with self.lock:
+            self.calls[hop] = self.calls.get(hop, 0) + 1
+
+    def fetch_graphql_schema(self, logger, endpoint_id, function_name, **kwargs):
+        self.count("fetch_graphql_schema")
+        self.sleep("fetch_graphql_schema")
+        return self.schema
+
+    def generate_graphql_operation(self, operation_name, operation_type, schema):
+        # Stands in for a full-graph selection; the fakes answer it whole.
+        return f"{operation_type.lower()} {operation_name} {{ {operation_name} }}"
+
+    def execute_graphql_query(
+        self, logger, endpoint_id, function_name, operation, variables, **kwargs
+    ):
+        (definition,) = [
+            definition
+            for definition in parse(operation).definitions
+            if hasattr(definition, "operation")
+        ]
+        result = {}
+        for field in definition.selection_set.selections:
+            assert isinstance(field, FieldNode)
+            key = field.alias.value if field.alias else field.name.value
+            prefix = f"{key}_" if field.alias else ""
+            field_variables = {
+                name[len(prefix) :]: value
+                for name, value in variables.items()
+                if name.startswith(prefix)
+            }
+            declared = {
+                variable_definition.variable.name.value[len(prefix) :]
+                for variable_definition in definition.variable_definitions
+                if variable_definition.variable.name.value.startswith(prefix)
+            }
+            with self.lock:
+                self.requests.append((field.name.value, declared, field_variables))
+            self.count(field.name.value)
+            self.sleep(field.name.value)
+            result[key] = project(
+                getattr(self, field.name.value)(field_variables), field.selection_set
+            )
+        return result
+
+    def invoke_funct_on_aws_lambda(self, logger, endpoint_id, funct, **kwargs):
+        self.count(funct)
+        self.sleep(funct)
+
+    def coordination(self, variables):
+        return {
+            "coordinationUuid": variables.get("coordinationUuid", "coordination-1"),
+            "assistantId": "assistant-1",
+            "assistantType": "conversation",
+            "additionalInstructions": self.padding,
+        }
+
+    def agent(self):
+        return {
+            "agentName": "agent-1",
+            "agentInstructions": self.agent_instructions,
+            "responseFormat": "text",
+        }
+
+    def thread(self, variables):
+        return {
+            "threadId": variables.get("threadId", "thread-1"),
+            "session": {"sessionUuid": variables.get("sessionUuid", "session-1")},
+            "agent": self.agent(),
+            "lastAssistantMessage": self.padding,
+            "status": variables.get("status", self.thread_status),
+            "log": None,
+        }
+
+    def insertUpdateSession(self, variables):
+        return {
+            "session": {
+                "sessionUuid": variables.get("sessionUuid")
+                or variables.get("session_uuid")
+                or "session-1",
+                "coordination": self.coordination(variables),
+                "threadIds": ["thread-1"],
+                "status": variables.get("status", "in_transit"),
+            }
+        }
+
+    def insertUpdateThread(self, variables):
+        return {"thread": self.thread(variables)}
+
+    def askOpenAi(self, variables):
+        return {
+            "functionName": "async_openai_assistant_stream",
+            "taskUuid": "task-1",
+            "threadId": variables.get("threadId", "thread-1"),
+            "currentRunId": "run-1",
+        }
+
+    def currentRun(self, variables):
+        return {"threadId": variables.get("threadId"), "status": "completed"}
+
+    def lastMessage(self, variables):
+        return {
+            "message": json.dumps(
+                {"status": "assigned", "agent_name": "agent-1", "message": self.padding}
+            )
+        }
+
+
+class FakeTable(object):
+    def __init__(self, downstream: FakeDownstream) -> None:
+        self.downstream = downstream
+
+    def query(self, **kwargs):
+        self.downstream.count("se-wss-connections")
+        self.downstream.sleep("se-wss-connections")
+        return {
+            "Items": [
+                {
+                    "connection_id": "connection-1",
+                    "data": {"email": "receiver@example.com"},
+                    "status": "active",
+                    "updated_at": "2024-01-01T00:00:00Z",
+                }
+            ]
+        }
+
+
+class FakeDynamoDB(object):
+    def __init__(self, downstream: FakeDownstream) -> None:
+        self.table = FakeTable(downstream)
+
+    def Table(self, name):
+        return self.table
+
+
+class FakeSES(object):
+    def __init__(self, downstream: FakeDownstream) -> None:
+        self.downstream = downstream
+
+    def send_email(self, **kwargs):
+        self.downstream.count("ses")
+        self.downstream.sleep("ses")
+        return {"MessageId": "message-1"}
+
+
+def start_fakes(downstream: FakeDownstream) -> list:
+    """Route every downstream hop of the handlers to ``downstream``."""
+    patches = [
+        mock.patch.object(Utility, name, getattr(downstream, name))
+        for name in (
+            "fetch_graphql_schema",
+            "generate_graphql_operation",
+            "execute_graphql_query",
+            "invoke_funct_on_aws_lambda",
+        )
+    ]
+    for patch in patches:
+        patch.start()
+    return patches
+
+
+def init_handlers(downstream: FakeDownstream, **extra_setting) -> dict:
+    handler_setting = dict(setting, **extra_setting)
+    handlers.handlers_init(logger, **handler_setting)
+    handlers.aws_clients.update(
+        {
+            "lambda": object(),
+            "dynamodb": FakeDynamoDB(downstream),
+            "ses": FakeSES(downstream),
+        }
+    )
+    return handler_setting
+
+
+def stop_fakes(patches: list) -> None:
+    for patch in patches:
+        patch.stop()
+    handlers.aws_clients.clear()
+
+
+def info(handler_setting: dict = setting, connection_id: str = None) -> SimpleNamespace:
+    return SimpleNamespace(
+        context={
+            "logger": logger,
+            "endpoint_id": endpoint_id,
+            "setting": handler_setting,
+            "connectionId": connection_id,
+        }
+    )
@@ -0,0 +1,201 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+sys.path.insert(0, f"{os.getenv('base_dir')}/ai_operation_hub_engine")
+sys.path.insert(1, f"{os.getenv('base_dir')}/silvaengine_dynamodb_base")
+sys.path.insert(2, f"{os.getenv('base_dir')}/silvaengine_utility")
+
+logging.basicConfig(stream=sys.stdout, level=logging.WARNING)
+
+from ai_operation_hub_engine import handlers
+from ai_operation_hub_engine.tests.offline_fakes import (
+    FakeDownstream,
+    endpoint_id,
+    info,
+    init_handlers,
+    logger,
+    setting,
+    start_fakes,
+    stop_fakes,
+)
+
+# Every knob can be set from the environment (or .env) of the CI job.
+latency_ms = float(os.getenv("benchmark_latency_ms", 20))
+# Per-hop overrides, e.g. {"askOpenAi": 400, "se-wss-connections": 5}.
+hop_latency_ms = json.loads(os.getenv("benchmark_hop_latency_ms", "{}"))
+payload_bytes = int(os.getenv("benchmark_payload_bytes", 2048))
+iterations = int(os.getenv("benchmark_iterations", 50))
+concurrency = int(os.getenv("benchmark_concurrency", 4))
+# Outside the tree by default, so a test run leaves the checkout clean.
+results_dir = os.getenv(
+    "benchmark_results_dir",
+    os.path.join(tempfile.gettempdir(), "ai_operation_hub_engine", "benchmark_results"),
+)
+baseline = os.getenv("benchmark_baseline")
+
+
+def percentile(samples: list, q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(q * (len(samples) - 1))))]
+
+
+def version() -> str:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=os.path.dirname(__file__),
+                stderr=subprocess.DEVNULL,
+            )
+            .decode("utf-8")
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class OfflineBenchmarkTest(unittest.TestCase):
+    """Benchmarks the request paths against local stand-ins for every downstream hop."""
+
+    results = {}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.downstream = FakeDownstream(
+            latency_ms=latency_ms,
+            hop_latency_ms=hop_latency_ms,
+            payload_bytes=payload_bytes,
+        )
+        cls.patches = start_fakes(cls.downstream)
+        init_handlers(cls.downstream)
+
+    @classmethod
+    def tearDownClass(cls):
+        stop_fakes(cls.patches)
+
+        if not cls.results:
+            return
+        os.makedirs(results_dir, exist_ok=True)
+        report = {
+            "version": version(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "config": {
+                "latency_ms": latency_ms,
+                "hop_latency_ms": hop_latency_ms,
+                "payload_bytes": payload_bytes,
+                "iterations": iterations,
+                "concurrency": concurrency,
+            },
+            "results": cls.results,
+        }
+        path = os.path.join(results_dir, f"{report['version']}.json")
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.warning(f"Benchmark results written to {path}.")
+
+        if baseline:
+            with open(baseline, "r") as f:
+                previous = json.load(f)["results"]
+            for name, result in cls.results.items():
+                if name in previous:
+                    logger.warning(
+                        f"{name}: p50 {previous[name]['p50_ms']:.1f} -> {result['p50_ms']:.1f} ms, "
+                        f"p99 {previous[name]['p99_ms']:.1f} -> {result['p99_ms']:.1f} ms, "
+                        f"throughput {previous[name]['throughput']:.1f} -> {result['throughput']:.1f}/s"
+                    )
+
+    def benchmark(self, name: str, fn) -> None:
+        fn()  # Warm the schema, operation and coordination caches.
+        self.downstream.calls.clear()
+
+        def timed(_):
+            start = time.perf_counter()
+            fn()
+            return (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(timed, range(iterations)))
+        elapsed = time.perf_counter() - start
+
+        self.results[name] = {
+            "p50_ms": percentile(samples, 0.5),
+            "p99_ms": percentile(samples, 0.99),
+            "mean_ms": sum(samples) / len(samples),
+            "throughput": iterations / elapsed,
+            "hops_per_call": {
+                hop: count / iterations for hop, count in self.downstream.calls.items()
+            },
+        }
+        logger.warning(f"{name}: {json.dumps(self.results[name])}")
+
+    def test_process_with_agent_name(self):
+        self.benchmark(
+            "process_with_agent_name",
+            lambda: handlers.process_with_agent_name(
+                info(),
+                coordination_uuid="coordination-1",
+                session_uuid="session-1",
+                agent_name="agent-1",
+                user_query="How are my orders doing?",
+                receiver_email="receiver@example.com",
+            ),
+        )
+
+    def test_process_no_agent_name(self):
+        self.benchmark(
+            "process_no_agent_name",
+            lambda: handlers.process_no_agent_name(
+                info(),
+                coordination_uuid="coordination-1",
+                user_query="How are my orders doing?",
+            ),
+        )
+
+    def test_resolve_coordination_thread_handler(self):
+        self.benchmark(
+            "resolve_coordination_thread_handler",
+            lambda: handlers.resolve_coordination_thread_handler(
+                info(), session_uuid="session-1", thread_id="thread-1"
+            ),
+        )
+
+    def test_async_update_coordination_thread_handler(self):
+        self.benchmark(
+            "async_update_coordination_thread_handler",
+            lambda: handlers.async_update_coordination_thread_handler(
+                logger,
+                endpoint_id=endpoint_id,
+                setting=setting,
+                session_uuid="session-1",
+                coordination_uuid="coordination-1",
+                agent_name="agent-1",
+                function_name="async_openai_assistant_stream",
+                task_uuid="task-1",
+                assistant_id="assistant-1",
+                thread_id="thread-1",
+                run_id="run-1",
+                receiver_email="receiver@example.com",
+            ),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,422 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+sys.path.insert(0, f"{os.getenv('base_dir')}/ai_operation_hub_engine")
+sys.path.insert(1, f"{os.getenv('base_dir')}/silvaengine_dynamodb_base")
+sys.path.insert(2, f"{os.getenv('base_dir')}/silvaengine_utility")
+
+logging.basicConfig(stream=sys.stdout, level=logging.WARNING)
+
+from ai_operation_hub_engine import aio_handlers, handlers, tracing
+from ai_operation_hub_engine.models import Thread
+from ai_operation_hub_engine.tests.offline_fakes import (
+    SCHEMA,
+    FakeDownstream,
+    endpoint_id,
+    info,
+    init_handlers,
+    logger,
+    start_fakes,
+    stop_fakes,
+)
+
+
+class OfflineHandlersTest(unittest.TestCase):
+    """Checks what the request paths send to the same local stand-ins."""
+
+    def setUp(self):
+        self.downstream = FakeDownstream()
+        self.patches = start_fakes(self.downstream)
+        self.setting = init_handlers(self.downstream)
+        handlers.invalidate_coordination()
+
+    def tearDown(self):
+        stop_fakes(self.patches)
+
+    def init(self, **extra_setting) -> None:
+        self.setting = init_handlers(self.downstream, **extra_setting)
+
+    def sent(self, operation_name: str) -> list:
+        return [
+            variables
+            for name, _, variables in self.downstream.requests
+            if name == operation_name
+        ]
+
+    def ask(self, connection_id: str = None, **kwargs):
+        return handlers.process_with_agent_name(
+            info(self.setting, connection_id=connection_id),
+            **dict(
+                {
+                    "coordination_uuid": "coordination-1",
+                    "session_uuid": "session-1",
+                    "agent_name": "agent-1",
+                    "user_query": "How are my orders doing?",
+                },
+                **kwargs,
+            ),
+        )
+
+    def test_run_completed_in_another_container(self):
+        pending_runs_store = {
+            "module_name": "ai_operation_hub_engine.stores",
+            "class_name": "LocalFileStore",
+            "options": {"directory": tempfile.mkdtemp()},
+        }
+        self.init(run_completion_mode="event", pending_runs_store=pending_runs_store)
+        self.ask()
+
+        # A fresh container only has what the completion event carries.
+        handlers.pending_runs_config = None
+        self.init(run_completion_mode="event", pending_runs_store=pending_runs_store)
+        self.downstream.requests.clear()
+        handlers.run_completed_handler(
+            logger,
+            endpoint_id=endpoint_id,
+            setting=self.setting,
+            task_uuid="task-1",
+            thread_id="thread-1",
+            run_id="run-1",
+            status="completed",
+        )
+
+        (write,) = self.sent("insertUpdateThread")
+        self.assertEqual(write["sessionUuid"], "session-1")
+        self.assertEqual(write["coordinationUuid"], "coordination-1")
+        self.assertEqual(write["status"], "completed")
+        self.assertIsNone(handlers.pending_runs.get("run-1"))
+
+    def pending_runs_store(self) -> dict:
+        return {
+            "module_name": "ai_operation_hub_engine.stores",
+            "class_name": "LocalFileStore",
+            "options": {"directory": tempfile.mkdtemp()},
+        }
+
+    def run_completed(self):
+        handlers.run_completed_handler(
+            logger,
+            endpoint_id=endpoint_id,
+            setting=self.setting,
+            thread_id="thread-1",
+            run_id="run-1",
+            status="completed",
+        )
+
+    def test_early_completion_event_is_not_overwritten(self):
+        self.init(
+            run_completion_mode="event", pending_runs_store=self.pending_runs_store()
+        )
+        register = handlers.expect_run_completed_event
+
+        def completed_at_once(*args, **kwargs):
+            register(*args, **kwargs)
+            self.run_completed()
+
+        with mock.patch.object(
+            handlers, "expect_run_completed_event", side_effect=completed_at_once
+        ):
+            self.ask()
+
+        statuses = [write["status"] for write in self.sent("insertUpdateThread")]
+        self.assertEqual(statuses, ["completed", "dispatched", "completed"])
+
+    def test_completion_event_reads_a_late_entry_again(self):
+        self.init(
+            run_completion_mode="event", pending_runs_store=self.pending_runs_store()
+        )
+        self.ask()
+        pop_pending_run = handlers.pop_pending_run
+        with mock.patch.object(
+            handlers,
+            "pop_pending_run",
+            side_effect=[None, pop_pending_run("run-1")],
+        ):
+            self.run_completed()
+
+        self.assertEqual(self.sent("insertUpdateThread")[-1]["status"], "completed")
+
+    def test_overdue_completion_event_is_swept(self):
+        self.init(
+            run_completion_mode="event",
+            run_completion_event_timeout=0,
+            run_poller_sweep_interval=0.01,
+            pending_runs_store=self.pending_runs_store(),
+        )
+        self.ask()
+        self.assertEqual(self.downstream.calls["poll_pending_runs"], 1)
+
+        handlers.poll_pending_runs_handler(
+            logger, endpoint_id=endpoint_id, setting=self.setting
+        )
+
+        self.assertEqual(self.sent("insertUpdateThread")[-1]["status"], "completed")
+        self.assertEqual(list(handlers.pending_runs.items()), [])
+
+    def test_pending_run_expires_after_deadline(self):
+        self.init(
+            run_completion_mode="event",
+            run_poll_deadline=0.05,
+            run_completed_retries=1,
+            run_completed_retry_interval=0.01,
+            pending_runs_store={
+                "module_name": "ai_operation_hub_engine.stores",
+                "class_name": "LocalFileStore",
+                "options": {"directory": tempfile.mkdtemp()},
+            },
+        )
+        self.ask()
+        time.sleep(0.1)
+
+        with self.assertRaisesRegex(Exception, "missing: session_uuid"):
+            handlers.run_completed_handler(
+                logger,
+                endpoint_id=endpoint_id,
+                setting=self.setting,
+                thread_id="thread-1",
+                run_id="run-1",
+                status="completed",
+            )
+
+    def test_lambda_poller_sweeps_the_pending_runs(self):
+        self.init(
+            run_completion_mode="poller",
+            run_poll_initial_interval=0.01,
+            run_poll_jitter=0,
+            run_poller_sweep_interval=0.01,
+            pending_runs_store={
+                "module_name": "ai_operation_hub_engine.stores",
+                "class_name": "LocalFileStore",
+                "options": {"directory": tempfile.mkdtemp()},
+            },
+        )
+        with mock.patch.dict(os.environ, {"AWS_LAMBDA_FUNCTION_NAME": "hub"}):
+            self.ask()
+            self.ask()
+        # The second dispatch finds the sweep already started.
+        self.assertEqual(self.downstream.calls["poll_pending_runs"], 1)
+        self.assertEqual(
+            [run.run_id for run in handlers.load_pending_runs()], ["run-1"]
+        )
+
+        self.downstream.requests.clear()
+        handlers.poll_pending_runs_handler(
+            logger, endpoint_id=endpoint_id, setting=self.setting
+        )
+
+        (write,) = self.sent("insertUpdateThread")
+        self.assertEqual(write["status"], "completed")
+        self.assertEqual(list(handlers.pending_runs.items()), [])
+
+    def resolve_ask(self, **kwargs):
+        return handlers.resolve_ask_operation_agent_handler(
+            info(self.setting),
+            **dict(
+                {
+                    "coordination_uuid": "coordination-1",
+                    "session_uuid": "session-1",
+                    "agent_name": "agent-1",
+                    "user_query": "yes",
+                },
+                **kwargs,
+            ),
+        )
+
+    def test_repeated_message_is_not_replayed(self):
+        self.resolve_ask()
+        self.resolve_ask()
+        self.assertEqual(len(self.sent("askOpenAi")), 2)
+
+    def test_idempotency_key_replays_the_result(self):
+        self.resolve_ask(idempotency_key="key-1")
+        self.resolve_ask(idempotency_key="key-1")
+        self.assertEqual(len(self.sent("askOpenAi")), 1)
+
+        # Any other option is another request.
+        self.resolve_ask(idempotency_key="key-1", user_query="Yes")
+        self.resolve_ask(idempotency_key="key-1", receiver_email="receiver@example.com")
+        self.resolve_ask(idempotency_key="key-1", stream=True)
+        self.assertEqual(len(self.sent("askOpenAi")), 4)
+
+    def test_long_poll_revalidates_a_cached_answer(self):
+        # This container saw the previous answer; another one took a new ask.
+        handlers.cache_coordination_thread(
+            endpoint_id,
+            Thread(thread_id="thread-1", session_uuid="session-1", status="completed"),
+        )
+        coordination_thread = handlers.resolve_coordination_thread_handler(
+            info(self.setting),
+            session_uuid="session-1",
+            thread_id="thread-1",
+            wait_seconds=0.1,
+            until_status=["completed"],
+        )
+        self.assertEqual(coordination_thread.status, "assigned")
+
+    def test_async_long_poll_is_woken_by_a_write(self):
+        def complete():
+            time.sleep(0.05)
+            handlers.insert_update_coordination_thread(
+                logger,
+                endpoint_id,
+                setting=self.setting,
+                sessionUuid="session-1",
+                threadId="thread-1",
+                status="completed",
+            )
+
+        async def long_poll():
+            writer = asyncio.get_running_loop().run_in_executor(None, complete)
+            coordination_thread = (
+                await aio_handlers.resolve_coordination_thread_handler_async(
+                    info(self.setting),
+                    session_uuid="session-1",
+                    thread_id="thread-1",
+                    wait_seconds=5,
+                    until_status=["completed"],
+                )
+            )
+            await writer
+            return coordination_thread
+
+        start = time.time()
+        coordination_thread = asyncio.run(long_poll())
+
+        self.assertEqual(coordination_thread.status, "completed")
+        self.assertLess(time.time() - start, 1)
+        # Only the initial read; the write woke the wait.
+        self.assertEqual(self.downstream.calls["thread"], 1)
+        self.assertEqual(handlers.coordination_thread_listeners, set())
+
+    def test_stream_reaches_ask_open_ai(self):
+        self.ask(connection_id="connection-1", stream=True)
+
+        ((_, declared, variables),) = [
+            request for request in self.downstream.requests if request[0] == "askOpenAi"
+        ]
+        self.assertIn("stream", declared)
+        self.assertIs(variables["stream"], True)
+
+    def test_stream_needs_the_downstream_argument(self):
+        schema = json.loads(json.dumps(SCHEMA))
+        for _type in schema["__schema"]["types"]:
+            for field in _type["fields"] or []:
+                if field["name"] == "askOpenAi":
+                    field["args"] = [
+                        arg for arg in field["args"] if arg["name"] != "stream"
+                    ]
+        self.downstream.schema = schema
+        self.addCleanup(
+            handlers.invalidate_graphql_schema,
+            endpoint_id,
+            "openai_assistant_graphql",
+            setting=self.setting,
+        )
+        handlers.invalidate_graphql_schema(
+            endpoint_id, "openai_assistant_graphql", setting=self.setting
+        )
+
+        with self.assertLogs(logger, level="WARNING") as logs:
+            self.ask(connection_id="connection-1", stream=True)
+        self.assertIn("takes no stream argument", "\n".join(logs.output))
+        (variables,) = self.sent("askOpenAi")
+        self.assertNotIn("stream", variables)
+
+    def test_cached_template_skips_the_agent_read(self):
+        self.ask()
+        # Only the agent name is selected once the template is cached.
+        self.downstream.agent_instructions = "Answer in one sentence."
+        self.ask()
+        handlers.invalidate_coordination(endpoint_id, "coordination-1")
+        self.ask()
+
+        first, second, third = self.sent("askOpenAi")
+        self.assertEqual(first["instructions"], self.downstream.padding)
+        self.assertEqual(second["instructions"], self.downstream.padding)
+        self.assertEqual(third["instructions"], "Answer in one sentence.")
+        self.assertEqual(third["assistantId"], "assistant-1")
+        self.assertEqual(third["additionalInstructions"], self.downstream.padding)
+
+    def test_session_upsert_reads_the_cached_coordination(self):
+        self.ask()
+        coordination = self.downstream.coordination
+        with mock.patch.object(
+            self.downstream,
+            "coordination",
+            lambda variables: dict(coordination(variables), assistantId="assistant-2"),
+        ):
+            cached = self.ask()
+            handlers.invalidate_coordination(endpoint_id, "coordination-1")
+            refreshed = self.ask()
+
+        self.assertEqual(cached.coordination["assistant_id"], "assistant-1")
+        self.assertEqual(refreshed.coordination["assistant_id"], "assistant-2")
+        assistant_ids = [
+            variables["assistantId"] for variables in self.sent("askOpenAi")
+        ]
+        self.assertEqual(assistant_ids, ["assistant-1", "assistant-1", "assistant-2"])
+
+    def test_payload_sizes_are_only_measured_in_a_trace(self):
+        with mock.patch.object(
+            tracing, "payload_bytes", wraps=tracing.payload_bytes
+        ) as measured, mock.patch.object(handlers, "payload_bytes", measured):
+            self.ask()
+            self.assertFalse(measured.called)
+
+            token = tracing.start_trace()
+            self.ask()
+            spans = tracing.end_trace(token)
+
+        self.assertTrue(measured.called)
+        self.assertTrue(all("request_bytes" in record for record in spans))
+        self.assertTrue(
+            all(
+                "response_bytes" in record
+                for record in spans
+                if record["kind"] == "graphql"
+            )
+        )
+
+    def test_assign_and_dispatch_are_one_write(self):
+        self.downstream.thread_status = "completed"
+        self.ask()
+
+        (write,) = self.sent("insertUpdateThread")
+        self.assertEqual(write["status"], "dispatched")
+        self.assertEqual(write["lastAssistantMessage"], "null")
+        self.assertNotIn("agentName", write)
+
+    def test_ask_open_ai_failure_keeps_the_assignment(self):
+        self.downstream.thread_status = "completed"
+        with mock.patch.object(
+            self.downstream, "askOpenAi", side_effect=Exception("Rate limited.")
+        ):
+            with self.assertRaisesRegex(Exception, "Rate limited."):
+                self.ask()
+
+        (write,) = self.sent("insertUpdateThread")
+        self.assertEqual(write["status"], "assigned")
+        # The agent and the log already hold their values.
+        self.assertNotIn("agentName", write)
+        self.assertNotIn("log", write)
+
+
+if __name__ == "__main__":
+    unittest.main()
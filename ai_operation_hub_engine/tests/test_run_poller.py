@@ -0,0 +1,114 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import logging
+import os
+import sys
+import unittest
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+sys.path.insert(0, f"{os.getenv('base_dir')}/ai_operation_hub_engine")
+
+logging.basicConfig(stream=sys.stdout, level=logging.WARNING)
+logger = logging.getLogger()
+
+from ai_operation_hub_engine.models import Run
+from ai_operation_hub_engine.run_poller import RunPoller
+
+setting = {
+    "run_poll_initial_interval": 0.01,
+    "run_poll_fast_polls": 1,
+    "run_poll_max_interval": 0.01,
+    "run_poll_jitter": 0,
+    "run_poller_batch_size": 2,
+}
+
+
+class RunPollerTest(unittest.TestCase):
+    """Drives RunPoller with canned run states instead of the assistant engine."""
+
+    def setUp(self):
+        self.statuses = {}
+        self.polled = []
+        self.finalized = []
+        self.failed = {}
+
+    def poll_runs(self, runs):
+        self.polled.append([run.run_id for run in runs])
+        statuses = [self.statuses[run.run_id] for run in runs]
+        for status in statuses:
+            if isinstance(status, Exception):
+                raise status
+        return [{"status": status} for status in statuses]
+
+    def finalize_run(self, run):
+        self.finalized.append(run.run_id)
+
+    def fail_run(self, run, log):
+        self.failed[run.run_id] = log
+
+    def drain(self, statuses, **extra_setting):
+        self.statuses.update(statuses)
+        poller = RunPoller(
+            logger,
+            poll_runs=self.poll_runs,
+            finalize_run=self.finalize_run,
+            fail_run=self.fail_run,
+            setting=dict(setting, **extra_setting),
+        )
+        for run_id in statuses:
+            poller.add(Run(run_id=run_id, endpoint_id="endpoint-1"))
+        poller.drain()
+        self.assertEqual(poller.pending(), 0)
+        return poller
+
+    def test_completed_runs_are_polled_in_batches(self):
+        self.drain({"run-1": "completed", "run-2": "completed", "run-3": "completed"})
+        self.assertEqual(sorted(map(len, self.polled)), [1, 2])
+        self.assertEqual(sorted(self.finalized), ["run-1", "run-2", "run-3"])
+        self.assertEqual(self.failed, {})
+
+    def test_failed_batch_is_polled_run_by_run(self):
+        self.drain({"run-1": "completed", "run-2": Exception("Unknown run.")})
+        self.assertIn(["run-1"], self.polled)
+        self.assertIn(["run-2"], self.polled)
+        self.assertEqual(self.finalized, ["run-1"])
+        self.assertIn("Unknown run.", self.failed["run-2"])
+
+    def test_failed_status_fails_the_run(self):
+        self.drain({"run-1": "expired"})
+        self.assertEqual(self.finalized, [])
+        self.assertIn("ended with status 'expired'", self.failed["run-1"])
+
+    def test_deadline_fails_the_run(self):
+        self.drain({"run-1": "in_progress"}, run_poll_deadline=0.05)
+        self.assertEqual(self.finalized, [])
+        self.assertIn("timed out", self.failed["run-1"])
+        self.assertGreater(len(self.polled), 1)
+
+    def test_finalize_error_fails_the_run(self):
+        def finalize_run(run):
+            raise Exception("Unable to save the message.")
+
+        self.finalize_run = finalize_run
+        self.drain({"run-1": "completed"})
+        self.assertIn("Unable to save the message.", self.failed["run-1"])
+
+    def test_fail_error_is_logged(self):
+        def fail_run(run, log):
+            raise Exception("Unable to save the failure.")
+
+        self.fail_run = fail_run
+        with self.assertLogs(logger, level="ERROR") as logs:
+            self.drain({"run-1": "cancelled"})
+        self.assertIn("Unable to save the failure.", "\n".join(logs.output))
+
+
+if __name__ == "__main__":
+    unittest.main()
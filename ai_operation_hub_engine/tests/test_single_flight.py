@@ -0,0 +1,102 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+sys.path.insert(0, f"{os.getenv('base_dir')}/ai_operation_hub_engine")
+
+from ai_operation_hub_engine.single_flight import SingleFlight
+from ai_operation_hub_engine.stores import LocalFileStore
+
+
+class SingleFlightTest(unittest.TestCase):
+    """Two SingleFlight instances sharing a store stand in for two containers."""
+
+    def setUp(self):
+        store = LocalFileStore(directory=tempfile.mkdtemp())
+        self.containers = [
+            SingleFlight(store=store, share_window=1, poll_interval=0.01)
+            for _ in range(2)
+        ]
+        self.calls = []
+        self.release = threading.Event()
+
+    def slow_call(self, result):
+        def fn():
+            self.calls.append(result)
+            self.release.wait(1)
+            return result
+
+        return fn
+
+    def test_duplicate_in_another_container_shares_the_result(self):
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            first = pool.submit(
+                self.containers[0].do, "key", self.slow_call({"run": 1}), replay=False
+            )
+            time.sleep(0.05)
+            second = pool.submit(
+                self.containers[1].do, "key", self.slow_call({"run": 2}), replay=False
+            )
+            time.sleep(0.05)
+            self.release.set()
+
+            self.assertEqual(first.result(), {"run": 1})
+            self.assertEqual(second.result(), {"run": 1})
+        self.assertEqual(self.calls, [{"run": 1}])
+
+    def test_duplicate_in_another_container_shares_the_error(self):
+        def fail():
+            self.release.wait(1)
+            raise Exception("Rate limited.")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            first = pool.submit(self.containers[0].do, "key", fail, replay=False)
+            time.sleep(0.05)
+            second = pool.submit(
+                self.containers[1].do, "key", self.slow_call({"run": 2}), replay=False
+            )
+            time.sleep(0.05)
+            self.release.set()
+
+            with self.assertRaisesRegex(Exception, "Rate limited."):
+                first.result()
+            with self.assertRaisesRegex(Exception, "Rate limited."):
+                second.result()
+        self.assertEqual(self.calls, [])
+
+    def test_finished_call_is_only_replayed_with_replay(self):
+        self.release.set()
+        self.containers[0].do("key", self.slow_call({"run": 1}), replay=False)
+        self.containers[1].do("key", self.slow_call({"run": 2}), replay=False)
+        self.containers[0].do("replayed", self.slow_call({"run": 3}))
+        replayed = self.containers[1].do("replayed", self.slow_call({"run": 4}))
+
+        self.assertEqual(replayed, {"run": 3})
+        self.assertEqual(self.calls, [{"run": 1}, {"run": 2}, {"run": 3}])
+
+    def test_call_lost_with_its_container_runs_again(self):
+        self.release.set()
+        store = self.containers[0].store
+        store.add("key", {"status": "in_flight", "claim": "lost"}, ttl=0.05)
+
+        result = self.containers[1].do("key", self.slow_call({"run": 2}), replay=False)
+
+        self.assertEqual(result, {"run": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
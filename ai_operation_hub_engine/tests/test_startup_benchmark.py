@@ -0,0 +1,78 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import json
+import logging
+import os
+import subprocess
+import sys
+import unittest
+
+from dotenv import load_dotenv
+
+load_dotenv()
+setting = {
+    "region_name": os.getenv("region_name"),
+    "aws_access_key_id": os.getenv("aws_access_key_id"),
+    "aws_secret_access_key": os.getenv("aws_secret_access_key"),
+    "source_email": os.getenv("source_email"),
+    "endpoint_id": os.getenv("endpoint_id"),
+}
+
+sys.path.insert(0, f"{os.getenv('base_dir')}/ai_operation_hub_engine")
+sys.path.insert(1, f"{os.getenv('base_dir')}/silvaengine_dynamodb_base")
+sys.path.insert(2, f"{os.getenv('base_dir')}/silvaengine_utility")
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger()
+
+# Runs in a fresh interpreter so the import is measured cold.
+STARTUP_SCRIPT = """
+import json, logging, sys, time
+
+start = time.perf_counter()
+from ai_operation_hub_engine import AIOperationHubEngine
+imported = time.perf_counter()
+AIOperationHubEngine(logging.getLogger(), **json.loads(sys.argv[1]))
+constructed = time.perf_counter()
+AIOperationHubEngine(logging.getLogger(), **json.loads(sys.argv[1]))
+warm = time.perf_counter()
+
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "construct_ms": (constructed - imported) * 1000,
+    "warm_construct_ms": (warm - constructed) * 1000,
+}))
+"""
+
+
+class StartupBenchmarkTest(unittest.TestCase):
+    def measure_startup(self) -> dict:
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        output = subprocess.check_output(
+            [sys.executable, "-c", STARTUP_SCRIPT, json.dumps(setting)], env=env
+        )
+        return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+    def test_startup_budget(self):
+        runs = int(os.getenv("startup_benchmark_runs", 5))
+        results = [self.measure_startup() for _ in range(runs)]
+        summary = {
+            key: sorted(result[key] for result in results)[runs // 2]
+            for key in results[0]
+        }
+        logger.info(f"Startup (median of {runs}): {json.dumps(summary)}")
+
+        # Guard the cold start when a budget is configured.
+        if os.getenv("startup_budget_ms"):
+            self.assertLessEqual(
+                summary["import_ms"] + summary["construct_ms"],
+                float(os.getenv("startup_budget_ms")),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+sys.path.insert(0, f"{os.getenv('base_dir')}/ai_operation_hub_engine")
+
+from ai_operation_hub_engine.stores import InMemoryStore, LocalFileStore
+
+
+class StoresTest(unittest.TestCase):
+    """Checks the conditional writes and listings every store offers."""
+
+    def stores(self):
+        return [InMemoryStore(), LocalFileStore(directory=tempfile.mkdtemp())]
+
+    def test_add_only_stores_a_missing_key(self):
+        for store in self.stores():
+            self.assertTrue(store.add("lease", {"owner": "a"}))
+            self.assertFalse(store.add("lease", {"owner": "b"}))
+            self.assertEqual(store.get("lease"), {"owner": "a"})
+
+    def test_add_replaces_an_expired_key(self):
+        for store in self.stores():
+            store.set("lease", {"owner": "a"}, ttl=0.01)
+            time.sleep(0.02)
+            self.assertTrue(store.add("lease", {"owner": "b"}))
+            self.assertEqual(store.get("lease"), {"owner": "b"})
+
+    def test_items_skip_expired_entries(self):
+        for store in self.stores():
+            store.set("run-1", {"run_id": "run-1"})
+            store.set("run-2", {"run_id": "run-2"}, ttl=0.01)
+            time.sleep(0.02)
+            self.assertEqual(list(store.items()), [("run-1", {"run_id": "run-1"})])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import os
+import sys
+import unittest
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+sys.path.insert(0, f"{os.getenv('base_dir')}/ai_operation_hub_engine")
+
+from ai_operation_hub_engine.models import Agent, Thread
+from ai_operation_hub_engine.write_buffer import ThreadWriteBuffer
+
+KEYS = {
+    "sessionUuid": "session-1",
+    "threadId": "thread-1",
+    "coordinationUuid": "coordination-1",
+    "updatedBy": "AI Operation Hub",
+}
+
+
+class ThreadWriteBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.writes = []
+
+    def write(self, fields=None, **variables):
+        self.writes.append((fields, variables))
+        return Thread(
+            thread_id=variables["threadId"],
+            agent=Agent(agent_name=variables.get("agentName")),
+            status=variables.get("status"),
+        )
+
+    def buffer(self, **known):
+        thread_writes = ThreadWriteBuffer(
+            self.write, known=Thread(**known) if known else None
+        )
+        thread_writes.update(**KEYS)
+        return thread_writes
+
+    def test_updates_are_merged_into_one_write(self):
+        thread_writes = self.buffer()
+        thread_writes.update(agentName="agent-1", status="assigned", log="null")
+        thread_writes.update(lastAssistantMessage="null", status="dispatched")
+        coordination_thread = thread_writes.flush()
+
+        self.assertEqual(
+            self.writes,
+            [
+                (
+                    None,
+                    dict(
+                        KEYS,
+                        agentName="agent-1",
+                        status="dispatched",
+                        log="null",
+                        lastAssistantMessage="null",
+                    ),
+                )
+            ],
+        )
+        self.assertEqual(coordination_thread.status, "dispatched")
+
+    def test_unchanged_fields_are_dropped(self):
+        thread_writes = self.buffer(
+            agent=Agent(agent_name="agent-1"), status="completed", log=None
+        )
+        # "null" clears a field, so it matches a field that is already unset.
+        thread_writes.update(agentName="agent-1", status="dispatched", log="null")
+        thread_writes.flush()
+
+        self.assertEqual(self.writes, [(None, dict(KEYS, status="dispatched"))])
+
+    def test_no_op_write_is_skipped(self):
+        known = Thread(
+            thread_id="thread-1",
+            agent=Agent(agent_name="agent-1"),
+            status="assigned",
+        )
+        thread_writes = ThreadWriteBuffer(self.write, known=known)
+        thread_writes.update(**KEYS)
+        thread_writes.update(agentName="agent-1", status="assigned", log="null")
+
+        self.assertIs(thread_writes.flush(), known)
+        self.assertEqual(self.writes, [])
+
+    def test_flush_returns_the_written_thread(self):
+        thread_writes = self.buffer(status="completed")
+        thread_writes.update(agentName="agent-2", status="assigned")
+        coordination_thread = thread_writes.flush(fields=("thread.agent",))
+
+        self.assertEqual(self.writes[0][0], ("thread.agent",))
+        self.assertEqual(coordination_thread.agent_name, "agent-2")
+        # The written thread is the new known state.
+        thread_writes.update(status="assigned")
+        self.assertIs(thread_writes.flush(), coordination_thread)
+        self.assertEqual(len(self.writes), 1)
+
+    def test_thread_change_flushes_the_pending_write(self):
+        thread_writes = self.buffer(status="completed")
+        thread_writes.update(status="assigned")
+        thread_writes.update(threadId="thread-2", status="dispatched")
+
+        self.assertEqual(self.writes, [(None, dict(KEYS, status="assigned"))])
+        thread_writes.flush()
+        # The state of the other thread is unknown, so everything is sent.
+        self.assertEqual(
+            self.writes[1], (None, dict(KEYS, threadId="thread-2", status="dispatched"))
+        )
+
+    def test_thread_change_without_pending_write(self):
+        thread_writes = self.buffer(status="dispatched")
+        thread_writes.update(threadId="thread-2", status="dispatched")
+        thread_writes.flush()
+
+        self.assertEqual(
+            self.writes, [(None, dict(KEYS, threadId="thread-2", status="dispatched"))]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
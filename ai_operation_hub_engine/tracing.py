@@ -0,0 +1,95 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import contextvars
+import json
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# Spans of the request being served; None when nobody collects them.
+request_spans = contextvars.ContextVar("request_spans", default=None)
+
+
+def start_trace() -> contextvars.Token:
+    """Collect the spans of the current request until end_trace."""
+    return request_spans.set([])
+
+
+def end_trace(token: contextvars.Token) -> List[Dict[str, Any]]:
+    spans = request_spans.get() or []
+    request_spans.reset(token)
+    return spans
+
+
+def measure_payloads(logger: logging.Logger) -> bool:
+    """Whether payload sizes are worth serialising payloads for: only while a
+    trace collects spans or debug logging is on."""
+    return request_spans.get() is not None or logger.isEnabledFor(logging.DEBUG)
+
+
+def payload_bytes(payload: Any) -> int:
+    if payload is None:
+        return 0
+    if isinstance(payload, (bytes, str)):
+        return len(payload)
+    return len(json.dumps(payload, default=str))
+
+
+def record_span(logger: logging.Logger, record: Dict[str, Any]) -> None:
+    """Log a finished span as a structured line and attach it to the request."""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"span": record}, default=str))
+    spans = request_spans.get()
+    if spans is not None:
+        spans.append(record)
+
+
+def record_run(
+    logger: logging.Logger, run_id: str, polls: int, wait_seconds: float, outcome: str
+) -> None:
+    """Report how many polls a run took and how long it was waited for."""
+    record_span(
+        logger,
+        {
+            "kind": "run",
+            "operation_name": "currentRun",
+            "run_id": run_id,
+            "polls": polls,
+            "duration_ms": round(wait_seconds * 1000, 2),
+            "outcome": outcome,
+        },
+    )
+
+
+@contextmanager
+def span(
+    logger: logging.Logger,
+    kind: str,
+    function_name: Optional[str] = None,
+    operation_name: Optional[str] = None,
+    payload: Any = None,
+) -> Iterator[Dict[str, Any]]:
+    """Time a downstream hop; the caller may add fields such as response_bytes."""
+    record = {
+        "kind": kind,
+        "function_name": function_name,
+        "operation_name": operation_name,
+    }
+    if measure_payloads(logger):
+        record["request_bytes"] = payload_bytes(payload)
+    start = time.perf_counter()
+    try:
+        yield record
+        record["outcome"] = "ok"
+    except Exception as e:
+        record["outcome"] = "error"
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        record_span(logger, record)
@@ -10,6 +10,7 @@ from graphene import (
     Decimal,
     Field,
     Float,
+    InputObjectType,
     Int,
     List,
     ObjectType,
@@ -30,6 +31,22 @@ class AskOperationAgentType(ObjectType):
     log = String()
 
 
+class AskOperationAgentInputType(InputObjectType):
+    coordination_uuid = String(required=True)
+    user_query = String(required=True)
+    agent_name = String()
+    session_uuid = String()
+    receiver_email = String()
+    idempotency_key = String()
+    stream = Boolean()
+
+
+class AskOperationAgentResultType(ObjectType):
+    index = Int()
+    result = Field(AskOperationAgentType)
+    error = String()
+
+
 class CoordinationThreadType(ObjectType):
     session_uuid = String()
     thread_id = String()
@@ -0,0 +1,71 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator
+
+import humps
+
+
+class SnakeCaseView(Mapping):
+    """Read-only snake_case view of a camelCase downstream response.
+
+    Reads the same keys ``humps.decamelize`` would produce, but translates
+    them on access and wraps nested objects only when they are read, so the
+    untouched parts of a response are never copied. ``to_dict`` returns the
+    fully decamelized copy for anything that needs a plain dict, such as JSON
+    serialisation.
+    """
+
+    __slots__ = ("_data", "_keys", "_values")
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        self._data = data
+        self._keys = None
+        self._values = {}
+
+    def _key_index(self) -> Dict[str, str]:
+        if self._keys is None:
+            self._keys = {humps.decamelize(key): key for key in self._data}
+        return self._keys
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._values:
+            self._values[key] = snake_case_view(self._data[self._key_index()[key]])
+        return self._values[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._key_index()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._key_index())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"SnakeCaseView({self._data!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return humps.decamelize(self._data)
+
+
+def snake_case_view(value: Any) -> Any:
+    """Wrap a response value: objects become views, lists wrap their items."""
+    if isinstance(value, dict):
+        return SnakeCaseView(value)
+    if isinstance(value, list):
+        return [snake_case_view(item) for item in value]
+    return value
+
+
+def materialize(value: Any) -> Any:
+    """Turn views (also inside lists) back into plain decamelized values."""
+    if isinstance(value, SnakeCaseView):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [materialize(item) for item in value]
+    return value
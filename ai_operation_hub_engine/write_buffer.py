@@ -0,0 +1,83 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .models import Thread
+
+# Variables naming the thread a write goes to.
+THREAD_KEY_FIELDS = ("sessionUuid", "threadId")
+# Variables sent with every write, whether or not they change anything.
+THREAD_CONTEXT_FIELDS = ("coordinationUuid", "updatedBy")
+# Thread attributes a pending variable is compared with.
+THREAD_STATE_FIELDS = {
+    "agentName": "agent_name",
+    "lastAssistantMessage": "last_assistant_message",
+    "status": "status",
+    "log": "log",
+}
+
+
+class ThreadWriteBuffer(object):
+    """Coalesces the writes one request makes to a coordination thread.
+
+    ``update`` merges variables into the pending write, later values winning.
+    ``flush`` sends them in one mutation through ``write``, leaving out the
+    fields that already hold the value in the last known state (``"null"``
+    counts as None), and skips the mutation when nothing is left. Changing
+    the thread a buffer points at flushes the pending write first.
+
+    ``known`` must carry every field of THREAD_STATE_FIELDS as stored, or be
+    None when the state is unknown.
+    """
+
+    def __init__(
+        self, write: Callable[..., Thread], known: Optional[Thread] = None
+    ) -> None:
+        self.write = write
+        self.known = known
+        self.keys = {}
+        self.pending = {}
+
+    def update(self, **variables: Any) -> None:
+        keys = {
+            field: variables.pop(field)
+            for field in THREAD_KEY_FIELDS + THREAD_CONTEXT_FIELDS
+            if field in variables
+        }
+        if any(
+            field in self.keys and keys[field] != self.keys[field]
+            for field in THREAD_KEY_FIELDS
+            if field in keys
+        ):
+            if self.pending:
+                self.flush()
+            self.known = None
+        self.keys.update(keys)
+        self.pending.update(variables)
+
+    def _unchanged(self, field: str, value: Any) -> bool:
+        if self.known is None or field not in THREAD_STATE_FIELDS:
+            return False
+        if value == "null":
+            value = None
+        return getattr(self.known, THREAD_STATE_FIELDS[field]) == value
+
+    def changes(self) -> Dict[str, Any]:
+        return {
+            field: value
+            for field, value in self.pending.items()
+            if not self._unchanged(field, value)
+        }
+
+    def flush(self, fields: Tuple[str, ...] = None) -> Optional[Thread]:
+        """Send the pending write, if it changes anything; return the thread."""
+        changes = self.changes()
+        self.pending = {}
+        if not changes:
+            return self.known
+        self.known = self.write(fields=fields, **dict(self.keys, **changes))
+        return self.known